@@ -0,0 +1,9 @@
+"""
+Performance benchmarks for the ODENN site.
+
+Each benchmark seeds a synthetic catalog into a throwaway test database
+(never the development or production database) and prints its results.
+Run them from the project root, for example:
+
+    python -m benchmarks.search --products 10000 100000
+"""
@@ -0,0 +1,103 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Numbers are compared by their path in the JSON (such as
+'pages.category.latency.p95_ms'). Times ('_ms', 'seconds') regress when
+they grow by more than --threshold and by more than --min-ms, throughputs
+('per_second') when they fall by more than --threshold, and query counts
+when they grow at all.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json --threshold 0.2
+
+Exits with status 1 if anything regressed.
+"""
+import argparse
+import json
+import sys
+
+# Page latencies vary by 10-20% between identical runs on a busy machine
+THRESHOLD = 0.2
+MIN_MS = 1.0
+
+# Counts and sample sizes, which aren't measurements, and the statistics
+# of a run's slowest few samples, which are mostly noise. Latency is
+# compared by p50 and p95.
+IGNORED = ('count', 'requests', 'rows', 'pages', 'products', 'categories', 'mean_ms', 'p99_ms', 'max_ms')
+
+
+def flatten(results, prefix=''):
+    """Numeric leaves of results keyed by their dotted path"""
+    values = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            values.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def direction(path):
+    """'lower' or 'higher' if path is a measurement that is better that way, else None"""
+    name = path.rsplit('.', 1)[-1]
+    if name in IGNORED:
+        return None
+    if name.endswith('per_second'):
+        return 'higher'
+    if name.endswith(('_ms', 'seconds', 'queries')):
+        return 'lower'
+    return None
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_ms=MIN_MS):
+    """Changes of every measurement found in both, with regressions flagged"""
+    before, after = flatten(baseline), flatten(current)
+    changes = []
+    for path in sorted(before.keys() & after.keys()):
+        better = direction(path)
+        if better is None:
+            continue
+        old, new = before[path], after[path]
+        change = (new - old) / old if old else 0.0
+        if path.endswith('queries'):
+            regressed = new > old
+        elif better == 'higher':
+            regressed = change < -threshold
+        else:
+            # Seconds are compared in ms for the absolute floor
+            scale = 1000 if path.endswith('seconds') else 1
+            regressed = change > threshold and (new - old) * scale > min_ms
+        changes.append({'metric': path, 'before': old, 'after': new, 'change': round(change, 3), 'regressed': regressed})
+    return changes
+
+
+def format_changes(changes):
+    """Lines describing the changes, regressions marked"""
+    return [
+        f"{'REGRESSED ' if c['regressed'] else '          '}{c['metric']}: {c['before']} -> {c['after']} ({c['change']:+.1%})"
+        for c in changes
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Relative change that counts as a regression')
+    parser.add_argument('--min-ms', type=float, default=MIN_MS, help='Smallest time increase that counts')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    changes = compare(baseline, current, args.threshold, args.min_ms)
+    print('\n'.join(format_changes(changes)))
+    regressions = [c for c in changes if c['regressed']]
+    print(f'{len(regressions)} regressions in {len(changes)} measurements')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
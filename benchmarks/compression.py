@@ -0,0 +1,104 @@
+"""
+Compression benchmark: page sizes and response times with and without
+Brotli/gzip.
+
+Seeds a catalog, then for the homepage, the products listing, a category
+page and a product page measures:
+
+- the size of the HTML uncompressed, as served compressed (the
+  middleware's settings) and as precompressed by the static build;
+- the time the middleware takes to compress it;
+- the response time for each Accept-Encoding, with the page cache off so
+  every request renders the page.
+
+Usage:
+    python -m benchmarks.compression --products 500 --categories 10
+"""
+import argparse
+import json
+
+from .utils import benchmark_database, setup_django, summarize, timer
+
+ENCODINGS = {'identity': '', 'gzip': 'gzip', 'br': 'br, gzip'}
+
+
+def measure_sizes(content):
+    """Bytes and compression times of content at the response and build settings"""
+    from oden_site.compression import BUILD_BROTLI_QUALITY, BUILD_GZIP_LEVEL, MAX_RANDOM_BYTES, compress
+
+    result = {'bytes': len(content)}
+    for encoding, build_quality in (('gzip', BUILD_GZIP_LEVEL), ('br', BUILD_BROTLI_QUALITY)):
+        with timer() as elapsed:
+            compressed = compress(content, encoding, max_random_bytes=MAX_RANDOM_BYTES)
+        result[f'{encoding}_bytes'] = len(compressed)
+        result[f'{encoding}_ms'] = round(elapsed['seconds'] * 1000, 2)
+        with timer() as elapsed:
+            compressed = compress(content, encoding, build_quality)
+        result[f'{encoding}_build_bytes'] = len(compressed)
+        result[f'{encoding}_build_ms'] = round(elapsed['seconds'] * 1000, 2)
+    return result
+
+
+def measure_latency(url, requests):
+    """Response time of url for each Accept-Encoding"""
+    from django.test import Client
+
+    client = Client(HTTP_HOST='localhost')
+    result = {}
+    for name, accept_encoding in ENCODINGS.items():
+        client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+        samples = []
+        for _ in range(requests):
+            with timer() as elapsed:
+                response = client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+            samples.append(elapsed['seconds'])
+        assert response.get('Content-Encoding', '') == (name if accept_encoding else '')
+        result[name] = summarize(samples)
+    return result
+
+
+def run(products, categories, requests, seed=0):
+    """Seed a catalog and measure its pages"""
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from home.models import HomePage
+    from products.models import ProductIndexPage, ProductPage
+
+    from .catalog import seed_catalog
+
+    results = {'products': products, 'categories': categories, 'pages': {}}
+    with benchmark_database(), override_settings(PAGE_CACHE_PAGE_TYPES=[]):
+        products_listing = seed_catalog(products, categories, seed=seed)
+        pages = {
+            'home': HomePage.objects.get().url,
+            'listing': products_listing.url,
+            'category': ProductIndexPage.objects.order_by('path').first().url,
+            'product': ProductPage.objects.order_by('path').first().url,
+        }
+        client = Client(HTTP_HOST='localhost')
+        for name, url in pages.items():
+            content = client.get(url, HTTP_ACCEPT_ENCODING='').content
+            results['pages'][name] = {
+                'size': measure_sizes(content),
+                'latency': measure_latency(url, requests),
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    result = run(args.products, args.categories, args.requests, args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
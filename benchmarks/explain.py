@@ -0,0 +1,96 @@
+"""
+Query plans of the hot product queries, before and after the denormalised
+category column.
+
+Seeds a catalog and runs each query the way the code used to write it (a
+treebeard path prefix scan under the category or listing page) and the way
+it does now (on ProductPage.category and its indexes), printing
+QuerySet.explain() and the median time of each. Both run against the
+current schema, so 'before' shows the plan the old query shape gets.
+
+Usage:
+    python -m benchmarks.explain --products 20000 --categories 20
+"""
+import argparse
+import json
+import statistics
+
+from .utils import benchmark_database, setup_django, timer
+
+
+def get_queries(category, products_listing):
+    """{name: (before queryset, after queryset)} of the hot product queries"""
+    from products.models import ProductIndexPage, ProductPage
+
+    live = ProductPage.objects.live().public()
+    return {
+        # Category page, sorted by price (ProductIndexPage.get_context)
+        'category_page_price': (
+            live.child_of(category).order_by('price', 'id')[:25],
+            live.filter(category=category).order_by('price', 'id')[:25],
+        ),
+        # Category page, newest first
+        'category_page_newest': (
+            live.child_of(category).order_by('-first_published_at', '-id')[:25],
+            live.filter(category=category).order_by('-first_published_at', '-id')[:25],
+        ),
+        # Search results filtered to one category (search.search_products)
+        'search_category_filter': (
+            live.filter(path__startswith=category.path, sku__istartswith='OD-00').order_by('sku')[:20],
+            live.filter(category=category, sku__istartswith='OD-00').order_by('sku')[:20],
+        ),
+        # Importer lookup of existing products (importer.ProductImporter.preload)
+        'import_preload': (
+            ProductPage.objects.filter(path__startswith=products_listing.path),
+            ProductPage.objects.filter(category__in=ProductIndexPage.objects.values_list('pk', flat=True)),
+        ),
+    }
+
+
+def time_query(queryset, repeat):
+    """Median seconds to fetch every row of queryset"""
+    samples = []
+    for _ in range(repeat):
+        with timer() as elapsed:
+            list(queryset.all())
+        samples.append(elapsed['seconds'])
+    return statistics.median(samples)
+
+
+def run(products, categories, repeat, seed=0):
+    """Seed a catalog and explain and time its hot queries"""
+    from products.models import ProductIndexPage
+
+    from .catalog import seed_catalog
+
+    results = {'products': products, 'categories': categories, 'queries': {}}
+    with benchmark_database():
+        products_listing = seed_catalog(products, categories, seed=seed)
+        category = ProductIndexPage.objects.order_by('path').last()
+        for name, querysets in get_queries(category, products_listing).items():
+            results['queries'][name] = {
+                label: {
+                    'plan': queryset.explain().splitlines(),
+                    'median_ms': round(time_query(queryset, repeat) * 1000, 2),
+                }
+                for label, queryset in zip(('before', 'after'), querysets)
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    result = run(args.products, args.categories, args.repeat, args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
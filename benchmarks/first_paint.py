@@ -0,0 +1,241 @@
+"""
+First paint benchmark: render-blocking CSS with and without critical CSS.
+
+Without critical CSS every page waits for main.css to download before
+anything is painted. With it, the page can be painted from the HTML alone.
+
+By default this seeds a catalog, renders each page type with CRITICAL_CSS
+on and off and reports, per page:
+
+- the HTML size as served (Brotli), which grows by the inlined CSS;
+- the render-blocking requests and their bytes (Brotli, minified);
+- a modelled first contentful paint for each network profile: connection
+  setup and the HTML request, plus another round trip and transfer for
+  the blocking requests. It ignores parsing, layout and TCP slow start, so
+  it is a comparison, not a prediction.
+
+With --browser it measures real first contentful paint instead: it starts
+the dev server twice (CRITICAL_CSS=True and False) on the configured
+database and loads the first page of each type in headless Chromium with
+the network throttled to --network, through Playwright
+(`pip install playwright && playwright install chromium`).
+
+Usage:
+    python -m benchmarks.first_paint --products 200 --categories 6
+    python -m benchmarks.first_paint --browser --network slow-4g --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+from .utils import benchmark_database, setup_django, summarize
+
+# (round trip ms, download kbit/s), Lighthouse's mobile and desktop profiles
+NETWORKS = {
+    'slow-4g': (150, 1638),
+    'cable': (40, 10240),
+}
+
+# Round trips before the HTML request: TCP and TLS handshakes
+CONNECTION_ROUND_TRIPS = 2
+
+LINK = re.compile(r'<link\b[^>]*>')
+SCRIPT = re.compile(r'<script\b[^>]*>')
+HEAD = re.compile(r'<head>(.*?)</head>', re.S)
+NOSCRIPT = re.compile(r'<noscript>.*?</noscript>', re.S)
+
+
+def get_pages():
+    """Path of the first live page of each type with critical CSS, by name"""
+    from django.apps import apps
+
+    from oden_site.critical_css import CRITICAL_PAGE_TYPES
+
+    pages = {}
+    for label, name in CRITICAL_PAGE_TYPES.items():
+        page = apps.get_model(label).objects.live().order_by('path').first()
+        if page is not None:
+            pages[name] = page.url
+    return pages
+
+
+def static_size(url):
+    """Brotli size of the minified static file at url"""
+    import rcssmin
+    import rjsmin
+    from django.conf import settings
+    from django.contrib.staticfiles import finders
+
+    from oden_site.compression import compress
+
+    name = url[len(settings.STATIC_URL):]
+    with open(finders.find(name), encoding='utf-8') as f:
+        source = f.read()
+    minified = rcssmin.cssmin(source) if name.endswith('.css') else rjsmin.jsmin(source)
+    return len(compress(minified.encode(), 'br'))
+
+
+def blocking_requests(html):
+    """URLs in the <head> of html that block rendering until they load"""
+    # <noscript> fallbacks only load with JavaScript turned off
+    head = NOSCRIPT.sub('', HEAD.search(html).group(1))
+    urls = [
+        re.search(r'href="([^"]+)"', tag).group(1)
+        for tag in LINK.findall(head)
+        if 'rel="stylesheet"' in tag
+    ]
+    urls += [
+        re.search(r'src="([^"]+)"', tag).group(1)
+        for tag in SCRIPT.findall(head)
+        if 'src=' in tag and not re.search(r'\b(defer|async)\b', tag)
+    ]
+    return urls
+
+
+def modelled_fcp(html_bytes, blocking_bytes, blocking_count, network):
+    """First contentful paint in ms on network, from transfer sizes alone"""
+    rtt, kbps = NETWORKS[network]
+    bytes_per_ms = kbps * 1000 / 8 / 1000
+    fcp = (CONNECTION_ROUND_TRIPS + 1) * rtt + html_bytes / bytes_per_ms
+    if blocking_count:
+        fcp += rtt + blocking_bytes / bytes_per_ms
+    return round(fcp)
+
+
+def measure_page(client, url):
+    """Served size, blocking requests and modelled FCP of url"""
+    from oden_site.compression import compress
+
+    html = client.get(url, HTTP_ACCEPT_ENCODING='').content
+    blocking = blocking_requests(html.decode())
+    html_bytes = len(compress(html, 'br'))
+    blocking_bytes = sum(static_size(url) for url in blocking)
+    return {
+        'html_br_bytes': html_bytes,
+        'blocking_requests': len(blocking),
+        'blocking_br_bytes': blocking_bytes,
+        'modelled_fcp_ms': {
+            network: modelled_fcp(html_bytes, blocking_bytes, len(blocking), network)
+            for network in NETWORKS
+        },
+    }
+
+
+def run(products, categories, seed=0):
+    """Seed a catalog and compare each page type with critical CSS on and off"""
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from home.models import AboutPage, ContactPage, HomePage
+
+    from .catalog import seed_catalog
+
+    results = {'products': products, 'categories': categories, 'pages': {}}
+    with benchmark_database(), override_settings(PAGE_CACHE_PAGE_TYPES=[]):
+        seed_catalog(products, categories, seed=seed)
+        home = HomePage.objects.get()
+        for page in (
+            AboutPage(title='About', slug='about', intro='<p>Outdoor products built to last.</p>'),
+            ContactPage(title='Contact', slug='contact', phone='01 234 5678', email='hello@example.com'),
+        ):
+            home.add_child(instance=page).save_revision().publish()
+
+        client = Client(HTTP_HOST='localhost')
+        for name, url in get_pages().items():
+            result = {}
+            for label, critical_css in (('before', False), ('after', True)):
+                with override_settings(CRITICAL_CSS=critical_css):
+                    result[label] = measure_page(client, url)
+            results['pages'][name] = result
+    return results
+
+
+def start_server(port, critical_css):
+    """Start the dev server with CRITICAL_CSS on or off and wait for it to answer"""
+    env = dict(os.environ, CRITICAL_CSS=str(critical_css), DEBUG='True')
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'The dev server did not start on port {port}')
+
+
+def browser_fcp(browser, url, network, runs):
+    """First contentful paint samples (in seconds) of url in fresh browser contexts"""
+    rtt, kbps = NETWORKS[network]
+    samples = []
+    for _ in range(runs):
+        context = browser.new_context()
+        page = context.new_page()
+        cdp = context.new_cdp_session(page)
+        cdp.send('Network.enable')
+        cdp.send('Network.emulateNetworkConditions', {
+            'offline': False,
+            'latency': rtt,
+            'downloadThroughput': kbps * 1000 / 8,
+            'uploadThroughput': kbps * 1000 / 8,
+        })
+        page.goto(url, wait_until='load')
+        fcp = page.evaluate("performance.getEntriesByName('first-contentful-paint')[0].startTime")
+        samples.append(fcp / 1000)
+        context.close()
+    return samples
+
+
+def run_browser(network, runs, port):
+    """Measure each page type's FCP in Chromium against the dev server"""
+    from playwright.sync_api import sync_playwright
+
+    pages = get_pages()
+    results = {'network': network, 'runs': runs, 'pages': {name: {} for name in pages}}
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch()
+        for label, critical_css in (('before', False), ('after', True)):
+            server = start_server(port, critical_css)
+            try:
+                for name, url in pages.items():
+                    samples = browser_fcp(browser, f'http://127.0.0.1:{port}{url}', network, runs)
+                    results['pages'][name][label] = summarize(samples)
+            finally:
+                server.terminate()
+                server.wait()
+        browser.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--browser', action='store_true', help='Measure FCP in headless Chromium')
+    parser.add_argument('--network', choices=NETWORKS, default='slow-4g')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    if args.browser:
+        result = run_browser(args.network, args.runs, args.port)
+    else:
+        result = run(args.products, args.categories, args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
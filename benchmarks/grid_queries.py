@@ -0,0 +1,79 @@
+"""
+Query count benchmark for the category and listing page card grids.
+
+Seeds a category with N products, and a listing page with N categories,
+all with images whose renditions are warmed, then counts the queries and
+times rendering each page. With the images and their renditions prefetched
+the query count should not grow with N, and as the category page shows a
+page of products at a time neither should its render time.
+
+Usage:
+    python -m benchmarks.grid_queries --cards 10 50 200
+"""
+import argparse
+import json
+import tempfile
+
+from .utils import benchmark_database, setup_django, summarize, timer
+
+
+def measure(url, requests):
+    """Query count and render time of a page, after a first request to warm caches"""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(HTTP_HOST='localhost')
+    assert client.get(url).status_code == 200
+    samples = []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as queries, timer() as elapsed:
+            client.get(url)
+        samples.append(elapsed['seconds'])
+    return {'queries': len(queries), 'render': summarize(samples)}
+
+
+def run(cards, images, requests, seed=0):
+    """Seed grids of the given size and measure their pages"""
+    from django.test.utils import override_settings
+
+    from products.models import ProductIndexPage
+    from products.renditions import get_image_specs, warm_renditions
+
+    from .catalog import seed_catalog
+    from .page_weight import seed_images
+
+    result = {'cards': cards}
+    # The page cache would serve every request after the first
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root, PAGE_CACHE_PAGE_TYPES=[]):
+        with benchmark_database():
+            seed_catalog(cards, 1, seed=seed)
+            seed_images(images, seed=seed, size=(800, 600))
+            warm_renditions(get_image_specs(), workers=1)
+            result['category_page'] = measure(ProductIndexPage.objects.get().url, requests)
+
+        with benchmark_database():
+            products_listing = seed_catalog(0, cards, seed=seed)
+            seed_images(images, seed=seed, size=(800, 600))
+            warm_renditions(get_image_specs(), workers=1)
+            result['listing_page'] = measure(products_listing.url, requests)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = [run(cards, args.images, args.requests, args.seed) for cards in args.cards]
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test of gunicorn's sync and gthread worker models on the product pages.
+
+Starts gunicorn with gunicorn.conf.py once per worker class, on the
+configured database, and requests that database's live product pages from
+--concurrency client threads for --duration seconds, reporting throughput,
+latency percentiles and errors for each.
+
+--io-delay-ms makes --io-fraction of the requests wait that long first, as
+a page generating an image rendition on Cloudinary does. A sync worker is
+blocked for the whole wait; a gthread worker only loses one thread.
+
+Usage:
+    python -m benchmarks.gunicorn_load --duration 20 --concurrency 16
+    python -m benchmarks.gunicorn_load --io-delay-ms 500 --io-fraction 0.1
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from .utils import setup_django, summarize
+
+WORKER_CLASSES = ('sync', 'gthread')
+
+
+def io_delayed_application():
+    """The site's WSGI app, with IO_DELAY_MS waits on IO_FRACTION of requests"""
+    from oden_site.wsgi import application
+
+    delay = int(os.environ.get('IO_DELAY_MS', '0')) / 1000
+    fraction = float(os.environ.get('IO_FRACTION', '0'))
+
+    def delayed(environ, start_response):
+        if delay and random.random() < fraction:
+            time.sleep(delay)
+        return application(environ, start_response)
+
+    return delayed
+
+
+def get_product_urls(limit):
+    """Paths of up to limit live product pages"""
+    from products.models import ProductPage
+
+    return [page.url for page in ProductPage.objects.live().order_by('path')[:limit]]
+
+
+def start_gunicorn(worker_class, port, io_delay_ms, io_fraction):
+    """Start gunicorn with gunicorn.conf.py and wait until it answers"""
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_LOG_LEVEL='warning',
+        PORT=str(port),
+        IO_DELAY_MS=str(io_delay_ms),
+        IO_FRACTION=str(io_fraction),
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--access-logfile', os.devnull,
+            'benchmarks.gunicorn_load:io_delayed_application()',
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(150):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'gunicorn did not start on port {port}')
+
+
+def fetch(url):
+    """Request url; returns (seconds, ok)"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def load(base_url, urls, concurrency, duration, seed=0):
+    """Request random urls from concurrency threads for duration seconds"""
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            seconds, ok = fetch(base_url + rng.choice(urls))
+            with lock:
+                (samples if ok else errors).append(seconds)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(samples),
+        'errors': len(errors),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'latency': summarize(samples) if samples else None,
+    }
+
+
+def run(worker_classes, pages, concurrency, duration, io_delay_ms, io_fraction, port):
+    """Load test each worker class in turn"""
+    urls = get_product_urls(pages)
+    if not urls:
+        raise SystemExit('No live product pages in the configured database')
+
+    results = {
+        'cpus': os.cpu_count(),
+        'pages': len(urls),
+        'concurrency': concurrency,
+        'duration': duration,
+        'io_delay_ms': io_delay_ms,
+        'io_fraction': io_fraction,
+        'worker_classes': {},
+    }
+    base_url = f'http://127.0.0.1:{port}'
+    for worker_class in worker_classes:
+        server = start_gunicorn(worker_class, port, io_delay_ms, io_fraction)
+        try:
+            for url in urls:
+                fetch(base_url + url)
+            results['worker_classes'][worker_class] = load(base_url, urls, concurrency, duration)
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-classes', nargs='+', choices=WORKER_CLASSES, default=list(WORKER_CLASSES))
+    parser.add_argument('--pages', type=int, default=50, help='Product pages requested')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per worker class')
+    parser.add_argument('--io-delay-ms', type=int, default=0)
+    parser.add_argument('--io-fraction', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    result = run(
+        args.worker_classes, args.pages, args.concurrency, args.duration,
+        args.io_delay_ms, args.io_fraction, args.port,
+    )
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
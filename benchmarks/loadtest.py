@@ -0,0 +1,273 @@
+"""
+Load test replaying a weighted mix of storefront traffic.
+
+Starts gunicorn with gunicorn.conf.py on the configured database (or uses
+the server at --url), then runs virtual users in asyncio, each on its own
+keep-alive connection, requesting routes picked by --mix weights:
+
+    home      the homepage
+    listing   /products/
+    category  a category page
+    product   a product page
+    search    /products/search/ with a query like a shopper's
+    document  a document download (dropped if there are no documents)
+
+Concurrency is ramped through --ramp, --stage-seconds at each level. For
+each stage and route it reports throughput, error rate, latency percentiles
+and a latency histogram. The URLs, queries and each user's sequence of
+requests are drawn from --seed, so runs with the same seed and database
+send the same traffic.
+
+The HTTP client is a small HTTP/1.1 client on asyncio streams, so there is
+nothing to install; it sends the Accept-Encoding of a browser. It shares the
+machine with the server, so compare runs on the same machine.
+
+Usage:
+    python -m benchmarks.loadtest --ramp 1 4 16 32 --stage-seconds 20
+    python -m benchmarks.loadtest --mix product=0.6 search=0.4 --output run.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --ramp 8
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import time
+from urllib.parse import urlencode, urlsplit
+
+from .utils import setup_django, summarize
+
+MIX = {
+    'home': 0.10,
+    'listing': 0.15,
+    'category': 0.25,
+    'product': 0.35,
+    'search': 0.10,
+    'document': 0.05,
+}
+
+# Upper bounds of the latency histogram buckets, in ms
+HISTOGRAM_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# URLs drawn per route
+URLS_PER_ROUTE = 200
+
+TIMEOUT = 30
+
+
+def get_route_urls(rng, limit=URLS_PER_ROUTE):
+    """Paths to request for each route, sampled with rng"""
+    from wagtail.documents import get_document_model
+
+    from home.models import HomePage
+    from products.models import ProductIndexPage, ProductPage, ProductsListingPage
+
+    from .search import make_queries
+
+    def sample(queryset):
+        pks = sorted(queryset.values_list('pk', flat=True))
+        return queryset.filter(pk__in=rng.sample(pks, min(limit, len(pks))))
+
+    routes = {
+        'home': [page.url for page in HomePage.objects.live()],
+        'listing': [page.url for page in ProductsListingPage.objects.live()],
+        'category': [page.url for page in sample(ProductIndexPage.objects.live())],
+        'product': [page.url for page in sample(ProductPage.objects.live())],
+        'search': [f'/products/search/?{urlencode({"q": query})}' for query in make_queries(rng, limit)],
+        'document': [document.url for document in sample(get_document_model().objects.all())],
+    }
+    # Sorted so the same seed picks the same URLs whatever order the database returns
+    return {route: sorted(urls) for route, urls in routes.items() if urls}
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened after errors"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        """Request path; returns the status code"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept-Encoding: br, gzip\r\n'
+            f'Connection: keep-alive\r\n\r\n'.encode('latin-1')
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if status in (204, 304):
+            pass
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def virtual_user(connection, rng, routes, weights, deadline, samples):
+    """Request weighted random routes until deadline, appending (route, seconds, error) to samples"""
+    names = list(routes)
+    while time.perf_counter() < deadline:
+        route = rng.choices(names, weights)[0]
+        path = rng.choice(routes[route])
+        start = time.perf_counter()
+        error = None
+        try:
+            status = await asyncio.wait_for(connection.get(path), TIMEOUT)
+            if status >= 400:
+                error = str(status)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            error = type(e).__name__
+            connection.close()
+        samples.append((route, time.perf_counter() - start, error))
+
+
+def histogram(samples):
+    """Counts of samples (in seconds) per latency bucket"""
+    counts = [0] * (len(HISTOGRAM_MS) + 1)
+    for seconds in samples:
+        counts[bisect.bisect_left(HISTOGRAM_MS, seconds * 1000)] += 1
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]}ms']
+    return dict(zip(labels, counts))
+
+
+def route_report(samples, seconds):
+    """Throughput, errors, latency and histogram of one route's samples"""
+    ok = [sample for route, sample, error in samples if error is None]
+    errors = {}
+    for route, sample, error in samples:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        'requests': len(samples),
+        'requests_per_second': round(len(samples) / seconds, 1),
+        'error_rate': round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+        'errors': errors,
+        'latency': summarize(ok) if ok else None,
+        'histogram': histogram(ok),
+    }
+
+
+async def run_stage(host, port, routes, weights, concurrency, seconds, seed):
+    """Run concurrency virtual users for seconds and report per route"""
+    samples = []
+    connections = [Connection(host, port) for _ in range(concurrency)]
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        virtual_user(connection, random.Random(f'{seed}:{concurrency}:{number}'), routes, weights, deadline, samples)
+        for number, connection in enumerate(connections)
+    ))
+    elapsed = time.perf_counter() - start
+    for connection in connections:
+        connection.close()
+
+    by_route = {route: [sample for sample in samples if sample[0] == route] for route in routes}
+    return {
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        **route_report(samples, elapsed),
+        'routes': {route: route_report(route_samples, elapsed) for route, route_samples in by_route.items()},
+    }
+
+
+def parse_mix(items):
+    """Route weights from route=weight items, or MIX if none are given"""
+    if not items:
+        return dict(MIX)
+    mix = {}
+    for item in items:
+        route, _, weight = item.partition('=')
+        if route not in MIX:
+            raise SystemExit(f'Unknown route {route!r}; routes are {", ".join(MIX)}')
+        mix[route] = float(weight) if weight else MIX[route]
+    return mix
+
+
+def run(url, mix, ramp, stage_seconds, seed, worker_class, port):
+    """Replay the traffic mix against url, or a gunicorn started for the run"""
+    from .gunicorn_load import start_gunicorn
+
+    rng = random.Random(seed)
+    routes = get_route_urls(rng)
+    skipped = sorted(route for route, weight in mix.items() if weight and route not in routes)
+    routes = {route: urls for route, urls in routes.items() if mix.get(route)}
+    weights = [mix[route] for route in routes]
+
+    results = {
+        'seed': seed,
+        'mix': {route: mix[route] for route in routes},
+        'skipped_routes': skipped,
+        'urls': {route: len(urls) for route, urls in routes.items()},
+        'stages': [],
+    }
+    server = None
+    if url is None:
+        server = start_gunicorn(worker_class, port, 0, 0)
+        url = f'http://127.0.0.1:{port}'
+        results['worker_class'] = worker_class
+    results['url'] = url
+    target = urlsplit(url)
+    try:
+        for concurrency in ramp:
+            stage = asyncio.run(run_stage(
+                target.hostname, target.port or 80, routes, weights, concurrency, stage_seconds, seed,
+            ))
+            results['stages'].append(stage)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Server to load instead of starting gunicorn')
+    parser.add_argument('--mix', nargs='+', metavar='ROUTE=WEIGHT', help='Routes and weights (default: MIX)')
+    parser.add_argument('--ramp', nargs='+', type=int, default=[1, 4, 16], help='Concurrency of each stage')
+    parser.add_argument('--stage-seconds', type=float, default=15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--worker-class', choices=('sync', 'gthread'), default='gthread')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--output', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    result = run(args.url, parse_mix(args.mix), args.ramp, args.stage_seconds, args.seed, args.worker_class, args.port)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
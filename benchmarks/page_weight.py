@@ -0,0 +1,264 @@
+"""
+Page weight benchmark: image bytes a browser downloads per page view.
+
+Seeds a small catalog with generated photos, warms the renditions the
+templates use and renders the homepage, a category page and a product page.
+The images each page would load are worked out from the HTML the way a
+browser picks them: the first <source> of a supported type, the smallest
+srcset candidate covering the slot width from 'sizes' times the device
+pixel ratio, and the @media / image-set() rules of the hero backgrounds.
+Images with loading="lazy" are counted separately, as they only load when
+scrolled to.
+
+'before' is what the previous templates loaded: a width-1920 JPEG hero,
+fill-400x300 cards and a width-800 product image for every device.
+
+Usage:
+    python -m benchmarks.page_weight --products 24 --categories 2
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+from html.parser import HTMLParser
+from io import BytesIO
+
+from .utils import benchmark_database, setup_django
+
+# (viewport width in CSS pixels, device pixel ratio, image formats supported)
+PROFILES = {
+    'mobile': (390, 3, ('avif', 'webp', 'jpeg')),
+    'tablet': (820, 2, ('webp', 'jpeg')),
+    'desktop': (1440, 1, ('avif', 'webp', 'jpeg')),
+}
+
+MIME_FORMATS = {'image/avif': 'avif', 'image/webp': 'webp', 'image/jpeg': 'jpeg'}
+
+# Specs of the templates before responsive images
+BEFORE_SPECS = {'hero': 'width-1920', 'card': 'fill-400x300', 'detail': 'width-800'}
+
+
+def make_photo(rng, width=2400, height=1600):
+    """A JPEG with gradients and noise, which compresses about like a photo"""
+    from PIL import Image, ImageChops, ImageFilter
+
+    gradient = Image.linear_gradient('L').resize((width, height)).rotate(rng.randrange(360))
+    noise = Image.effect_noise((width, height), 40).filter(ImageFilter.GaussianBlur(2))
+    image = Image.merge('RGB', [
+        ImageChops.add(gradient.point(lambda v, c=rng.randrange(256): v * c // 255), noise, scale=1.6)
+        for _ in range(3)
+    ])
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=90)
+    return output
+
+
+def seed_images(count, seed=0, size=(2400, 1600)):
+    """Give the homepage, categories and products generated photos"""
+    from django.core.files.images import ImageFile
+    from wagtail.images import get_image_model
+
+    from home.models import HomePage
+    from products.models import ProductIndexPage, ProductPage
+
+    rng = random.Random(seed)
+    Image = get_image_model()
+    images = [
+        Image.objects.create(title=f'Photo {number}', file=ImageFile(make_photo(rng, *size), name=f'photo-{number}.jpg'))
+        for number in range(count)
+    ]
+    HomePage.objects.update(hero_background=images[0])
+    for number, page in enumerate(ProductIndexPage.objects.order_by('path')):
+        ProductIndexPage.objects.filter(pk=page.pk).update(cover_photo=images[number % count])
+    for number, page in enumerate(ProductPage.objects.order_by('path')):
+        ProductPage.objects.filter(pk=page.pk).update(image=images[number % count])
+
+
+class ImageCollector(HTMLParser):
+    """Collect <picture> sources, <img> tags and <style> text from a page"""
+
+    def __init__(self):
+        super().__init__()
+        self.pictures = []
+        self.styles = []
+        self.in_picture = False
+        self.in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'picture':
+            self.in_picture = True
+            self.pictures.append({'sources': [], 'img': None})
+        elif tag == 'source' and self.in_picture:
+            self.pictures[-1]['sources'].append(attrs)
+        elif tag == 'img':
+            if self.in_picture:
+                self.pictures[-1]['img'] = attrs
+            else:
+                self.pictures.append({'sources': [], 'img': attrs})
+        elif tag == 'style':
+            self.in_style = True
+            self.styles.append('')
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self.in_picture = False
+        elif tag == 'style':
+            self.in_style = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self.styles[-1] += data
+
+
+def slot_width(sizes, viewport):
+    """Width in CSS pixels an image is shown at, from its sizes attribute"""
+    for entry in (sizes or '100vw').split(','):
+        match = re.match(r'\s*(?:\(max-width:\s*(\d+)px\)\s*)?(\d+)(vw|px)\s*$', entry)
+        max_width, value, unit = match.groups()
+        if max_width is None or viewport <= int(max_width):
+            return viewport * int(value) / 100 if unit == 'vw' else int(value)
+    return viewport
+
+
+def pick_srcset(srcset, needed):
+    """Smallest srcset candidate at least needed pixels wide, else the widest"""
+    candidates = []
+    for candidate in srcset.split(','):
+        url, _, width = candidate.strip().partition(' ')
+        candidates.append((int(width.rstrip('w')) if width else 0, url))
+    candidates.sort()
+    for width, url in candidates:
+        if width >= needed:
+            return url
+    return candidates[-1][1]
+
+
+def picture_url(picture, profile):
+    """URL a browser with profile loads for a <picture> or <img>"""
+    viewport, ratio, formats = profile
+    img = picture['img']
+    for source in picture['sources']:
+        if MIME_FORMATS.get(source.get('type')) in formats:
+            return pick_srcset(source['srcset'], slot_width(source.get('sizes'), viewport) * ratio)
+    if img.get('srcset'):
+        return pick_srcset(img['srcset'], slot_width(img.get('sizes'), viewport) * ratio)
+    return img['src']
+
+
+def background_urls(styles, profile):
+    """URLs of the backgrounds the background_image_set rules give a viewport"""
+    viewport, ratio, formats = profile
+    chosen = {}
+    for style in styles:
+        for line in style.strip().splitlines():
+            media = re.match(r'@media \(max-width: (\d+)px\)', line)
+            if media and viewport > int(media.group(1)):
+                continue
+            selector = re.search(r'^(?:@media [^{]+\{ )?([^{]+?) \{', line).group(1)
+            for url, mime in re.findall(r'url\("([^"]+)"\) type\("([^"]+)"\)', line):
+                if MIME_FORMATS[mime] in formats:
+                    chosen[selector] = url
+                    break
+    return set(chosen.values())
+
+
+def file_size(url):
+    from django.conf import settings
+
+    return os.path.getsize(os.path.join(settings.MEDIA_ROOT, url[len(settings.MEDIA_URL):]))
+
+
+def page_weight(html, profile):
+    """Bytes of the images loaded up front and of those lazy loaded on scroll"""
+    collector = ImageCollector()
+    collector.feed(html)
+    eager = background_urls(collector.styles, profile)
+    lazy = set()
+    for picture in collector.pictures:
+        url = picture_url(picture, profile)
+        (lazy if picture['img'].get('loading') == 'lazy' else eager).add(url)
+    lazy -= eager
+    return sum(map(file_size, eager)), sum(map(file_size, lazy))
+
+
+def before_weight(images):
+    """Bytes the old templates loaded: [(image, 'hero'|'card'|'detail')], all up front"""
+    urls = {image.get_rendition(BEFORE_SPECS[use]).url for image, use in images}
+    return sum(map(file_size, urls))
+
+
+def run(products, categories, images, seed=0):
+    """Seed a catalog with photos and measure the image weight of its pages"""
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from home.models import HomePage
+    from products.models import ProductIndexPage, ProductPage
+    from products.renditions import get_image_specs, warm_renditions
+
+    from .catalog import seed_catalog
+
+    with benchmark_database(), tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root):
+        seed_catalog(products, categories, seed=seed)
+        seed_images(images, seed=seed)
+        # One thread: SQLite's in-memory test database can't take concurrent writes
+        warmed = warm_renditions(get_image_specs(), workers=1)
+
+        home = HomePage.objects.get()
+        category = ProductIndexPage.objects.order_by('path').select_related('cover_photo').first()
+        category_products = ProductPage.objects.child_of(category).select_related('image')
+        product = category_products.first()
+        pages = {
+            'home': (home.url, [(home.hero_background, 'hero')]),
+            'category': (
+                category.url,
+                [(category.cover_photo, 'hero')] + [(page.image, 'card') for page in category_products],
+            ),
+            'product': (product.url, [(product.image, 'detail')]),
+        }
+
+        client = Client(HTTP_HOST='localhost')
+        results = {}
+        for name, (url, page_images) in pages.items():
+            html = client.get(url).content.decode()
+            before = before_weight(page_images)
+            results[name] = {}
+            for profile_name, profile in PROFILES.items():
+                eager, lazy = page_weight(html, profile)
+                results[name][profile_name] = {
+                    'before_bytes': before,
+                    'after_bytes': eager,
+                    'after_lazy_bytes': lazy,
+                    'saving_pct': round(100 * (1 - eager / before), 1) if before else None,
+                }
+
+    return {
+        'products': products,
+        'categories': categories,
+        'images': images,
+        'renditions_warmed': warmed['generated'],
+        'warm_seconds': round(warmed['seconds'], 2),
+        'pages': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=24)
+    parser.add_argument('--categories', type=int, default=2)
+    parser.add_argument('--images', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    result = run(args.products, args.categories, args.images, args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Latency benchmark for the server-side product search endpoint.
+
+Usage:
+    python -m benchmarks.search --products 10000 100000 --queries 200
+"""
+import argparse
+import json
+import random
+
+from .utils import benchmark_database, setup_django, summarize, timer
+
+
+def make_queries(rng, count):
+    """Return a reproducible mix of word, multi-word, SKU-prefix and missing-term queries"""
+    from .catalog import ADJECTIVES, DESCRIPTION_WORDS, NOUNS
+
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(rng.choice(NOUNS).split()[-1].lower())
+        elif kind < 0.6:
+            queries.append(f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}')
+        elif kind < 0.8:
+            queries.append(f'OD-{rng.randrange(1000):03d}')
+        elif kind < 0.95:
+            queries.append(rng.choice(DESCRIPTION_WORDS))
+        else:
+            queries.append('nonexistentterm')
+    return queries
+
+
+def run(products, categories, queries, seed=0):
+    """Seed a catalog of the given size and time search requests against it"""
+    from django.test import Client
+
+    from .catalog import seed_catalog
+
+    rng = random.Random(seed)
+    with benchmark_database():
+        with timer() as seed_time:
+            products_listing = seed_catalog(products, categories, seed=seed)
+
+        client = Client(HTTP_HOST='localhost')
+        samples = []
+        for query in make_queries(rng, queries):
+            params = {'q': query, 'page': rng.choice([1, 1, 1, 2])}
+            if rng.random() < 0.2:
+                params['category'] = rng.choice(products_listing.get_children()).pk
+            with timer() as elapsed:
+                response = client.get('/products/search/', params)
+            assert response.status_code == 200, response.status_code
+            samples.append(elapsed['seconds'])
+
+    return {
+        'products': products,
+        'categories': categories,
+        'seed_seconds': round(seed_time['seconds'], 2),
+        'search': summarize(samples),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = [run(products, args.categories, args.queries, args.seed) for products in args.products]
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == '__main__':
+    main()
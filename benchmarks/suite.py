@@ -0,0 +1,203 @@
+"""
+Benchmark suite: page renders, CSV import and static build at a given scale.
+
+Seeds a synthetic catalog in a fresh test database (SQLite, or Postgres if
+DATABASE_URL points at a local server) and measures:
+
+- pages: latency percentiles and query counts of the HomePage,
+  ProductsListingPage, a ProductIndexPage and a ProductPage, rendered
+  through the test client with the page cache off;
+- import: rows per second of `manage.py import_products` on a generated
+  CSV of new products, then of importing the same file again (unchanged
+  rows are skipped);
+- build: time to render the whole static site into a temporary directory.
+
+The results, with the scale, database and git commit, are written as JSON
+to --output. Pass a previous results file with --compare to flag
+regressions (see benchmarks/compare.py).
+
+Usage:
+    python -m benchmarks.suite --scale small --output results.json
+    python -m benchmarks.suite --scale medium --compare results.json
+    DATABASE_URL=postgres://localhost/oden python -m benchmarks.suite --scale large --steps pages import
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from .compare import THRESHOLD, compare, format_changes
+from .utils import benchmark_database, setup_django, summarize, timer
+
+# Products and categories of each --scale
+SCALES = {
+    'small': (100, 5),
+    'medium': (10000, 50),
+    'large': (100000, 200),
+}
+
+STEPS = ('pages', 'import', 'build')
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_pages():
+    """URL of the page of each type that is measured"""
+    from home.models import HomePage
+    from products.models import ProductIndexPage, ProductPage, ProductsListingPage
+
+    return {
+        'home': HomePage.objects.live().get().url,
+        'listing': ProductsListingPage.objects.live().get().url,
+        'category': ProductIndexPage.objects.live().order_by('path').first().url,
+        'product': ProductPage.objects.live().order_by('path').first().url,
+    }
+
+
+def measure_pages(requests):
+    """Latency and query count of each page type, after a request to warm caches"""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(HTTP_HOST='localhost')
+    results = {}
+    for name, url in get_pages().items():
+        assert client.get(url).status_code == 200
+        samples = []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as queries, timer() as elapsed:
+                client.get(url)
+            samples.append(elapsed['seconds'])
+        results[name] = {'url': url, 'queries': len(queries), 'latency': summarize(samples)}
+    return results
+
+
+def write_import_csv(path, rows, categories, seed=0):
+    """A CSV of rows new products, spread over existing and new categories"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product_category', 'product', 'price'])
+        for number in range(rows):
+            # Half into the seeded categories, half into new ones
+            category = number % (categories * 2)
+            name = f'Category {category}' if category < categories else f'Imported Category {category}'
+            writer.writerow([name, f'Imported Product {number}', f'{rng.randrange(1999, 249999) / 100:.2f}'])
+
+
+def measure_import(rows, categories):
+    """Seconds and rows per second of importing a new CSV, then importing it again"""
+    from django.core.management import call_command
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'products.csv')
+        write_import_csv(path, rows, categories)
+        for name in ('import', 'reimport'):
+            with timer() as elapsed:
+                call_command('import_products', path, stdout=StringIO())
+            results[name] = {
+                'rows': rows,
+                'seconds': round(elapsed['seconds'], 3),
+                'rows_per_second': round(rows / elapsed['seconds'], 1),
+            }
+    return results
+
+
+def measure_build():
+    """Seconds and pages per second of a full static build"""
+    from oden_site.static_build import build_pages
+
+    with tempfile.TemporaryDirectory() as build_dir, timer() as elapsed:
+        report = build_pages(build_dir, rebuild_all=True)
+    return {
+        'pages': report['total'],
+        'seconds': round(elapsed['seconds'], 3),
+        'pages_per_second': round(report['total'] / elapsed['seconds'], 1),
+    }
+
+
+def run(products, categories, steps, requests, import_rows, seed=0):
+    """Seed a catalog and run the steps against it"""
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    from .catalog import seed_catalog
+
+    results = {
+        'meta': {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'products': products,
+            'categories': categories,
+        },
+    }
+    with benchmark_database(), override_settings(PAGE_CACHE_PAGE_TYPES=[]):
+        with timer() as elapsed:
+            seed_catalog(products, categories, seed=seed)
+        results['seed'] = {'seconds': round(elapsed['seconds'], 3)}
+        # Measured before the import, which adds products
+        if 'pages' in steps:
+            results['pages'] = measure_pages(requests)
+        if 'build' in steps:
+            results['build'] = measure_build()
+        if 'import' in steps:
+            results['import'] = measure_import(import_rows, categories)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--products', type=int, help='Overrides the scale')
+    parser.add_argument('--categories', type=int, help='Overrides the scale')
+    parser.add_argument('--steps', nargs='+', choices=STEPS, default=list(STEPS))
+    parser.add_argument('--requests', type=int, default=20, help='Requests per page type')
+    parser.add_argument('--import-rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Previous results file to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    products, categories = SCALES[args.scale]
+    products = args.products or products
+    categories = args.categories or categories
+
+    setup_django()
+    result = run(products, categories, args.steps, args.requests, args.import_rows, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        changes = compare(baseline, result, args.threshold)
+        print('\n'.join(format_changes(changes)))
+        regressions = [c for c in changes if c['regressed']]
+        print(f'{len(regressions)} regressions in {len(changes)} measurements')
+        if regressions:
+            sys.exit(1)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark script"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oden_site.settings')
+    import django
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    # The performance log shares stdout with the results
+    import logging
+    logging.getLogger('oden_site.perf').setLevel(logging.ERROR)
+
+
+@contextmanager
+def benchmark_database():
+    """Create a fresh test database for the duration of the block, then destroy it"""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples using nearest-rank"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return latency statistics in milliseconds for a list of durations in seconds"""
+    millis = [sample * 1000 for sample in samples]
+    return {
+        'count': len(millis),
+        'mean_ms': round(statistics.mean(millis), 2),
+        'p50_ms': round(percentile(millis, 50), 2),
+        'p95_ms': round(percentile(millis, 95), 2),
+        'p99_ms': round(percentile(millis, 99), 2),
+        'max_ms': round(max(millis), 2),
+    }
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose 'seconds' key holds the elapsed time once the block exits"""
+    elapsed = {}
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed['seconds'] = time.perf_counter() - start
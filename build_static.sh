@@ -1,10 +1,21 @@
 #!/bin/bash
 # Script to build the static site
+#
+# Usage:
+#   ./build_static.sh                 # full build: wipe 'build' and render every page
+#   ./build_static.sh --incremental   # only render pages changed since the last build
+#   ./build_static.sh --parallel      # full build in one process per CPU, swapped in when done
 
 echo "Building static site..."
 python manage.py collectstatic --noinput
-python manage.py build
+if [ "$1" == "--incremental" ]; then
+    python manage.py build_incremental
+elif [ "$1" == "--parallel" ]; then
+    python manage.py build_parallel
+else
+    python manage.py build
+    python manage.py compress_build
+fi
 
 echo "Static site built in the 'build' directory!"
 echo "You can now deploy the contents of the 'build' directory to any static hosting service."
-
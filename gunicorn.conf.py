@@ -0,0 +1,109 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+Worker model (GUNICORN_WORKER_CLASS):
+
+- 'gthread' (the default): WEB_CONCURRENCY processes of GUNICORN_THREADS
+  threads each. A request waiting on the database or on Cloudinary (such as
+  an image rendition being generated) holds one thread, not a whole
+  process, so the others keep serving.
+- 'sync': one request per process, 2 x CPUs + 1 processes by default.
+
+The app is loaded once in the master before forking (preload_app), so the
+workers share its memory copy-on-write and start faster, and max_requests
+restarts each worker after a jittered number of requests to bound memory
+growth. The hooks below log worker starts, exits and timeouts, and refuse
+to start with a per-process cache (see CACHES in settings.py).
+
+Every setting can be overridden with an environment variable; see
+benchmarks/gunicorn_load.py for a comparison of the worker models.
+"""
+import multiprocessing
+import os
+import time
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+wsgi_app = 'oden_site.wsgi:application'
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gthread':
+    workers = env_int('WEB_CONCURRENCY', cpus + 1)
+    threads = env_int('GUNICORN_THREADS', 4)
+else:
+    workers = env_int('WEB_CONCURRENCY', cpus * 2 + 1)
+    threads = 1
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Requests slower than this are killed and their worker restarted
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+# Longer than the default 2s, so connections from Railway's proxy are reused
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Worker heartbeats in memory rather than on the container's disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Refuse per-process caches, which page and import signals only clear in one process"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oden_site.settings')
+    from django.conf import settings
+    if settings.PAGE_CACHE_BACKEND == 'locmem':
+        raise RuntimeError(
+            "PAGE_CACHE_BACKEND=locmem keeps a cache per process; use 'db' or 'file' under gunicorn"
+        )
+
+
+def when_ready(server):
+    """Log the worker model, and the time since start.sh began"""
+    if preload_app:
+        # Import the views in the master too, so the workers share them
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+    started = os.environ.get('BOOT_STARTED')
+    boot = f' boot_ms={(time.time() - float(started)) * 1000:.0f}' if started else ''
+    server.log.info(
+        f'event=ready worker_class={worker_class} workers={workers} threads={threads} '
+        f'preload={preload_app}{boot}'
+    )
+
+
+def pre_fork(server, worker):
+    # Connections opened while preloading mustn't be shared with the workers
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    server.log.info(f'event=worker_start pid={worker.pid} age={worker.age}')
+
+
+def worker_exit(server, worker):
+    server.log.info(f'event=worker_exit pid={worker.pid} requests={getattr(worker, "nr", 0)}')
+
+
+def worker_abort(worker):
+    worker.log.warning(f'event=worker_timeout pid={worker.pid} timeout={timeout}')
+
+
+def nworkers_changed(server, new_value, old_value):
+    if old_value is not None:
+        server.log.info(f'event=workers_changed workers={new_value} previous={old_value}')
@@ -0,0 +1,112 @@
+"""
+Container start-up steps, run in one Django process by `manage.py boot`.
+
+start.sh used to run collectstatic, migrate, createcachetable and
+create_superuser.py one after another, each booting Django again, before
+starting gunicorn. Now:
+
+- static files are collected when the image is built (railway.json's
+  buildCommand), so boot only collects them if the manifest is missing;
+- migrate only runs if the migration plan has anything to apply;
+- the cache table and superuser checks are a query each.
+
+Each step is timed, so slow boots can be traced to a step.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def static_files_collected():
+    """Whether collectstatic has written the manifest the storage serves from"""
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name is None:
+        return os.path.isdir(settings.STATIC_ROOT)
+    return staticfiles_storage.exists(manifest_name)
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    """Migrations migrate would apply, from the plan alone"""
+    executor = MigrationExecutor(connections[database])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def ensure_superuser():
+    """Create a superuser from the SUPERUSER_* variables if there is none; returns it, or None"""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    if User.objects.filter(is_superuser=True).exists():
+        return None
+    return User.objects.create_superuser(
+        username=os.environ.get('SUPERUSER_USERNAME', 'admin'),
+        email=os.environ.get('SUPERUSER_EMAIL', 'admin@example.com'),
+        password=os.environ.get('SUPERUSER_PASSWORD', 'admin123'),
+    )
+
+
+class BootTimer:
+    """Records how long each boot phase took and what it did"""
+
+    def __init__(self, started=None):
+        self.started = started
+        self.phases = []
+
+    def record(self, name, seconds, note=''):
+        self.phases.append((name, seconds, note))
+
+    def phase(self, name, step):
+        """Run step(), which returns a note on what it did, and record its time"""
+        start = time.perf_counter()
+        note = step()
+        self.record(name, time.perf_counter() - start, note)
+        return note
+
+    def report(self):
+        """The phases as lines of a table, with the total since start.sh began if known"""
+        lines = [f'{name:<14}{seconds * 1000:>8.0f}ms  {note}' for name, seconds, note in self.phases]
+        if self.started is not None:
+            lines.append(f'{"total":<14}{(time.time() - self.started) * 1000:>8.0f}ms  since start.sh began')
+        return lines
+
+
+def boot(timer, collectstatic=False, migrate=False):
+    """Run the start-up steps, forcing collectstatic or migrate if asked"""
+
+    def collect_static():
+        if not collectstatic and static_files_collected():
+            return 'skipped, collected at build time'
+        # As before, a failure here shouldn't stop the site from starting
+        try:
+            call_command('collectstatic', interactive=False, verbosity=0)
+        except Exception as e:
+            return f'failed: {e}'
+        return 'collected'
+
+    def run_migrations():
+        plan = pending_migrations()
+        if not plan and not migrate:
+            return 'skipped, none pending'
+        call_command('migrate', interactive=False, verbosity=1)
+        return f'applied {len(plan)}'
+
+    def create_cache_table():
+        # The page and search index cache tables, for PAGE_CACHE_BACKEND=db
+        call_command('createcachetable', verbosity=0)
+        return settings.PAGE_CACHE_BACKEND
+
+    def check_superuser():
+        user = ensure_superuser()
+        if user is None:
+            return 'exists'
+        return f'created {user.get_username()}, change its password after first login!'
+
+    timer.phase('static files', collect_static)
+    timer.phase('migrations', run_migrations)
+    timer.phase('cache table', create_cache_table)
+    timer.phase('superuser', check_superuser)
@@ -0,0 +1,183 @@
+"""
+Critical (above-the-fold) CSS for each page type.
+
+main.css is one large stylesheet, and a <link> to it blocks rendering until
+it has downloaded. Instead base.html inlines the few rules the top of each
+page type needs and loads main.css asynchronously (see the critical_css
+template tag), so the header and the start of the content can be painted
+from the HTML alone.
+
+`manage.py extract_critical_css` renders a live page of each type in
+CRITICAL_PAGE_TYPES and keeps the rules of main.css whose selectors only
+use tags, classes and ids found above the fold: the header and the first
+FOLD_ELEMENTS elements of <main>. Interaction states (:hover, :focus...)
+are left to main.css. The results are written to
+static/css/critical/<name>.css and committed, so a deploy doesn't need a
+database to build them; rerun the command after changing main.css or the
+templates.
+"""
+import functools
+import os
+import re
+from html.parser import HTMLParser
+
+import rcssmin
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+# Page type label -> name of its critical CSS file
+CRITICAL_PAGE_TYPES = {
+    'home.HomePage': 'home',
+    'products.ProductsListingPage': 'listing',
+    'products.ProductIndexPage': 'category',
+    'products.ProductPage': 'product',
+    'home.AboutPage': 'about',
+    'home.ContactPage': 'contact',
+}
+
+STYLESHEET = 'css/main.css'
+CRITICAL_DIR = 'css/critical'
+
+# Elements of <main> treated as above the fold; enough for the hero or page
+# heading and the first row of cards
+FOLD_ELEMENTS = 60
+
+# Rules for these states only matter once the user interacts with the page
+INTERACTION_STATES = re.compile(r':(hover|focus|focus-visible|focus-within|active|visited)\b|::selection')
+PSEUDO = re.compile(r'::?[\w-]+(\([^)]*\))?')
+ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+TOKEN = re.compile(r'[.#]?-?[A-Za-z_][\w-]*')
+ANIMATION = re.compile(r'animation(?:-name)?\s*:\s*([^;}]+)')
+
+
+class FoldParser(HTMLParser):
+    """Collects the tags, .classes and #ids of the header and the top of <main>"""
+
+    def __init__(self):
+        super().__init__()
+        self.tokens = {'html', 'body'}
+        self.in_header = 0
+        self.in_main = False
+        self.main_elements = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'header':
+            self.in_header += 1
+        elif tag == 'main':
+            self.in_main = True
+        elif self.in_main and not self.in_header:
+            self.main_elements += 1
+            if self.main_elements > FOLD_ELEMENTS:
+                return
+        elif not self.in_header:
+            return
+        self.tokens.add(tag)
+        attrs = dict(attrs)
+        self.tokens.update('.' + name for name in (attrs.get('class') or '').split())
+        if attrs.get('id'):
+            self.tokens.add('#' + attrs['id'])
+
+    def handle_endtag(self, tag):
+        if tag == 'header' and self.in_header:
+            self.in_header -= 1
+        elif tag == 'main':
+            self.in_main = False
+
+
+def get_fold_tokens(html):
+    """Tags, .classes and #ids above the fold of a rendered page"""
+    parser = FoldParser()
+    parser.feed(html)
+    return parser.tokens
+
+
+def parse_blocks(css):
+    """Top level (prelude, body) pairs of a stylesheet, comments removed"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    blocks = []
+    position = 0
+    while True:
+        start = css.find('{', position)
+        if start == -1:
+            return blocks
+        depth, end = 1, start + 1
+        while depth:
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            end += 1
+        # Drop any statements (such as @charset) before the block
+        prelude = css[position:start].rsplit(';', 1)[-1].strip()
+        blocks.append((prelude, css[start + 1:end - 1].strip()))
+        position = end
+
+
+def selector_matches(selector, tokens):
+    """Whether every tag, class and id in selector is in tokens"""
+    if INTERACTION_STATES.search(selector):
+        return False
+    # Attribute selectors (such as the dark theme's) are kept whenever the
+    # rest matches, as their attributes may be set by JavaScript
+    selector = PSEUDO.sub(' ', ATTRIBUTE.sub(' ', selector))
+    return all(token in tokens for token in TOKEN.findall(selector))
+
+
+def select_rules(blocks, tokens):
+    """CSS text of the rules of blocks whose selectors match tokens"""
+    rules = []
+    for prelude, body in blocks:
+        if prelude.startswith(('@media', '@supports')):
+            inner = select_rules(parse_blocks(body), tokens)
+            if inner:
+                rules.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@font-face'):
+            rules.append(f'{prelude}{{{body}}}')
+        elif not prelude.startswith('@'):
+            selectors = [s.strip() for s in prelude.split(',') if selector_matches(s, tokens)]
+            if selectors:
+                rules.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(rules)
+
+
+def used_keyframes(blocks, css):
+    """CSS text of the @keyframes that css refers to"""
+    names = {name for value in ANIMATION.findall(css) for name in re.split(r'[\s,]+', value)}
+    return ''.join(
+        f'{prelude}{{{body}}}'
+        for prelude, body in blocks
+        if prelude.startswith('@keyframes') and prelude.split()[-1] in names
+    )
+
+
+def extract_critical_css(stylesheet, html):
+    """The minified rules of stylesheet needed above the fold of html"""
+    blocks = parse_blocks(stylesheet)
+    css = select_rules(blocks, get_fold_tokens(html))
+    return rcssmin.cssmin(css + used_keyframes(blocks, css))
+
+
+def get_stylesheet():
+    """The source of main.css"""
+    with open(finders.find(STYLESHEET), encoding='utf-8') as f:
+        return f.read()
+
+
+def get_critical_path(name):
+    """Where the critical CSS of name is written, in the project's static dir"""
+    return os.path.join(settings.STATICFILES_DIRS[0], CRITICAL_DIR, f'{name}.css')
+
+
+@functools.lru_cache(maxsize=None)
+def get_critical_css(name):
+    """The critical CSS of name, or None if it hasn't been extracted"""
+    path = finders.find(f'{CRITICAL_DIR}/{name}.css')
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def get_page_critical_css(page):
+    """The critical CSS of page's type, or None if there is none or it is turned off"""
+    if not settings.CRITICAL_CSS or page is None:
+        return None
+    name = CRITICAL_PAGE_TYPES.get(page._meta.label)
+    return get_critical_css(name) if name else None
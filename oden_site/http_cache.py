@@ -0,0 +1,92 @@
+"""
+HTTP caching headers for anonymous page views.
+
+Pages of the types in settings.PAGE_CACHE_CONTROL are sent with a weak
+ETag and that type's Cache-Control, so browsers and a CDN can keep them and
+revalidate with If-None-Match.
+
+The ETag is worked out before the page is rendered, from the page and the
+live pages below it (which is what category and listing pages show): the
+latest publish date, the latest live revision and how many there are, so
+publishing, unpublishing, deleting or moving a product all change it.
+Only pages that can't have children, such as products, also get a
+Last-Modified date for If-Modified-Since: no date changes when a page below
+is unpublished, deleted or moved, so on the others it would give stale
+304s. A matching revalidation is answered with a 304 from Wagtail's
+before_serve_page hook, without rendering. PageCacheMiddleware stores the
+headers with the cached page and answers revalidations of cache hits the
+same way.
+
+settings.PAGE_ETAG_VERSION is part of every ETag; it changes with each
+deploy so pages are refetched after template changes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from wagtail import hooks
+from wagtail.models import Page
+
+from .page_cache import is_cacheable_request
+
+
+def get_validators(page):
+    """
+    Return (weak ETag, Last-Modified timestamp) of page and the live pages
+    below it. The timestamp is None for page types that can have children.
+    """
+    state = Page.objects.live().descendant_of(page, inclusive=True).aggregate(
+        last_published_at=Max('last_published_at'),
+        live_revision=Max('live_revision'),
+        pages=Count('pk'),
+    )
+    last_published_at = state['last_published_at'] or page.last_published_at or page.latest_revision_created_at
+    key = f'{settings.PAGE_ETAG_VERSION}:{page.pk}:{state["pages"]}:{state["live_revision"]}:{last_published_at}'
+    etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+    if not last_published_at or page.allowed_subpage_models():
+        return etag, None
+    return etag, int(last_published_at.timestamp())
+
+
+def set_cache_headers(response, etag, last_modified, cache_control):
+    """Add the validators and Cache-Control to a page response"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, **cache_control)
+
+
+@hooks.register('before_serve_page')
+def conditional_page_response(page, request, serve_args, serve_kwargs):
+    """Answer a matching revalidation of a page with a 304 before it is rendered"""
+    cache_control = settings.PAGE_CACHE_CONTROL.get(page._meta.label)
+    # Also skips static build renders, which go through the middleware like
+    # any request but must not be answered with a 304
+    if cache_control is None or not is_cacheable_request(request):
+        return None
+    if page.get_view_restrictions().exists():
+        return None
+
+    etag, last_modified = get_validators(page)
+    request.page_cache_headers = (etag, last_modified, cache_control)
+    response = HttpResponse()
+    set_cache_headers(response, *request.page_cache_headers)
+    conditional_response = get_conditional_response(request, etag, last_modified, response)
+    return None if conditional_response is response else conditional_response
+
+
+class PageCacheHeadersMiddleware:
+    """Add the headers worked out by conditional_page_response to the rendered page"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cache_headers = getattr(request, 'page_cache_headers', None)
+        if cache_headers and response.status_code == 200 and not response.cookies:
+            set_cache_headers(response, *cache_headers)
+        return response
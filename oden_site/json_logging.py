@@ -0,0 +1,25 @@
+"""
+JSON log lines, one per record, for log drains to parse.
+
+A record whose message is a dict (as oden_site.perf logs) has its keys
+merged into the line; any other message goes in 'message'.
+"""
+import json
+import logging
+from datetime import datetime, timezone
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        line = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+        }
+        if isinstance(record.msg, dict):
+            line.update(record.msg)
+        else:
+            line['message'] = record.getMessage()
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
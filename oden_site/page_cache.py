@@ -0,0 +1,202 @@
+"""
+Full-page cache for anonymous visitors.
+
+Rendered responses of the page types in settings.PAGE_CACHE_PAGE_TYPES are
+stored in the 'pages' cache, keyed by site and path, and served by
+PageCacheMiddleware before Wagtail routes the request, so a hit runs no
+get_context(), template rendering or rendition lookups.
+
+Entries are deleted when Wagtail publishes, unpublishes or deletes a page:
+the page itself, its ancestors (the category and listing pages that list it)
+and every site's homepage. Moves and bulk imports, which change many URLs or
+pages at once, clear the whole cache. The receivers are connected in
+products/signals.py.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from wagtail import hooks
+from wagtail.models import Page, Site
+
+CACHE_ALIAS = 'pages'
+
+# Response headers that must not be replayed to other visitors
+UNCACHED_HEADERS = {'set-cookie', 'content-length'}
+
+# Hit/miss counters are kept per process and added to the shared counters
+# in the cache every FLUSH_EVERY requests, to avoid a cache write per request
+STATS_KEYS = {'hit': 'page-cache:hits', 'miss': 'page-cache:misses'}
+FLUSH_EVERY = 50
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def get_page_cache():
+    return caches[CACHE_ALIAS]
+
+
+def cache_key(site_id, path):
+    """Cache key of the page served at path on a site"""
+    return f'page-cache:page:{site_id}:{hashlib.md5(path.encode()).hexdigest()}'
+
+
+def is_cacheable_request(request):
+    """
+    Only anonymous GET/HEAD requests without a query string are cached, and
+    not XMLHttpRequests, which pages can answer with a fragment (Wagtail's
+    ajax_template), or static build renders, which pages render differently
+    (see IncrementalPublishedPagesView)
+    """
+    return (
+        not getattr(request, 'is_static_build', False)
+        and request.method in ('GET', 'HEAD')
+        and not request.META.get('QUERY_STRING')
+        and not request.user.is_authenticated
+        and request.headers.get('x-requested-with') != 'XMLHttpRequest'
+    )
+
+
+@hooks.register('before_serve_page')
+def mark_cacheable_page(page, request, serve_args, serve_kwargs):
+    """Tell the middleware that the page being served may be cached"""
+    if page._meta.label in settings.PAGE_CACHE_PAGE_TYPES and not page.get_view_restrictions().exists():
+        request.page_cache_cacheable = True
+
+
+def count(result):
+    """Count a cache hit or miss"""
+    with _counts_lock:
+        _counts[result] += 1
+        flush = sum(_counts.values()) >= FLUSH_EVERY
+    if flush:
+        flush_stats()
+
+
+def flush_stats():
+    """Add this process's counters to the shared ones in the cache"""
+    with _counts_lock:
+        counts = dict(_counts)
+        _counts.clear()
+    cache = get_page_cache()
+    for result, value in counts.items():
+        if value:
+            cache.add(STATS_KEYS[result], 0, timeout=None)
+            cache.incr(STATS_KEYS[result], value)
+
+
+def get_stats():
+    """Shared hit/miss counters, including this process's unflushed counts"""
+    flush_stats()
+    cache = get_page_cache()
+    hits = cache.get(STATS_KEYS['hit'], 0)
+    misses = cache.get(STATS_KEYS['miss'], 0)
+    total = hits + misses
+    return {
+        'backend': settings.PAGE_CACHE_BACKEND,
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _counts_lock:
+        _counts.clear()
+    get_page_cache().delete_many(STATS_KEYS.values())
+
+
+class PageCacheMiddleware:
+    """Serve anonymous page views from the 'pages' cache and store the cacheable ones"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_cacheable_request(request):
+            return self.get_response(request)
+
+        site = Site.find_for_request(request)
+        if site is None:
+            return self.get_response(request)
+
+        cache = get_page_cache()
+        key = cache_key(site.pk, request.path)
+        cached = cache.get(key)
+        if cached is not None:
+            count('hit')
+            response = HttpResponse(cached['content'], status=cached['status'])
+            for header, value in cached['headers']:
+                response[header] = value
+            response['X-Page-Cache'] = 'hit'
+            # Revalidations are answered with a 304 when the cached page has
+            # the validators the client sent (see http_cache.py)
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+                response=response,
+            )
+
+        response = self.get_response(request)
+        if (
+            getattr(request, 'page_cache_cacheable', False)
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            count('miss')
+            cache.set(key, {
+                'status': response.status_code,
+                'content': response.content,
+                'headers': [
+                    (header, value) for header, value in response.items()
+                    if header.lower() not in UNCACHED_HEADERS
+                ],
+            })
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+
+def get_page_keys(page):
+    """Cache keys of a page, its ancestors and every site's homepage"""
+    keys = set()
+    for ancestor in Page.objects.ancestor_of(page, inclusive=True):
+        url_parts = ancestor.get_url_parts()
+        if url_parts is not None:
+            site_id, root_url, page_path = url_parts
+            keys.add(cache_key(site_id, page_path))
+    for site_id in Site.objects.values_list('pk', flat=True):
+        keys.add(cache_key(site_id, '/'))
+    return keys
+
+
+def invalidate_page(page):
+    """Delete the cached responses that show page"""
+    get_page_cache().delete_many(get_page_keys(page))
+
+
+def clear_page_cache():
+    """Delete every cached page, keeping the hit/miss counters"""
+    cache = get_page_cache()
+    stats = cache.get_many(STATS_KEYS.values())
+    cache.clear()
+    if stats:
+        cache.set_many(stats, timeout=None)
+
+
+def page_changed(sender, instance, **kwargs):
+    """Receiver for page_published, page_unpublished and post_delete"""
+    if isinstance(instance, Page):
+        invalidate_page(instance)
+
+
+def pages_changed(sender, **kwargs):
+    """Receiver for post_page_move and products_imported"""
+    clear_page_cache()
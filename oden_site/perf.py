@@ -0,0 +1,156 @@
+"""
+Per-request performance metrics.
+
+PerformanceMiddleware records, for each request other than static files:
+
+- the total time in Django;
+- the number and time of database queries;
+- the template render time, measured from just before a TemplateResponse
+  is rendered to its post-render callback;
+- image rendition lookups and renditions created, counted from the queries
+  on the rendition table;
+- the Wagtail page type served and whether the page cache was hit.
+
+They are sent in a Server-Timing header (shown in the browser's network
+panel) if PERF_SERVER_TIMING is on, and logged as a JSON line on the
+'oden_site.perf' logger for PERF_LOG_SAMPLE_RATE of requests. Requests
+slower than PERF_SLOW_REQUEST_MS are always logged, as warnings with their
+PERF_SLOW_QUERIES most expensive statements.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from wagtail import hooks
+from wagtail.images import get_image_model
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """Metrics of one request; also the database execute wrapper that counts queries"""
+
+    def __init__(self, rendition_table):
+        self.start = time.perf_counter()
+        self.rendition_table = rendition_table
+        self.queries = 0
+        self.query_seconds = 0.0
+        # SQL -> [count, seconds], for the slow request report
+        self.statements = {}
+        self.rendition_lookups = 0
+        self.renditions_created = 0
+        self.render_start = None
+        self.render_seconds = None
+        self.page_type = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            self.queries += 1
+            self.query_seconds += seconds
+            statement = self.statements.setdefault(sql, [0, 0.0])
+            statement[0] += 1
+            statement[1] += seconds
+            if self.rendition_table in sql:
+                if sql.lstrip()[:6].upper() == 'INSERT':
+                    self.renditions_created += 1
+                else:
+                    self.rendition_lookups += 1
+
+    def rendered(self, response):
+        """Post-render callback of the page's TemplateResponse"""
+        self.render_seconds = time.perf_counter() - self.render_start
+
+    def top_queries(self, count):
+        """The count statements that took longest in total"""
+        statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {'sql': sql[:1000], 'count': calls, 'ms': round(seconds * 1000, 2)}
+            for sql, (calls, seconds) in statements[:count]
+        ]
+
+    def as_dict(self, request, response, total_seconds):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'page_type': self.page_type,
+            'page_cache': response.get('X-Page-Cache'),
+            'total_ms': round(total_seconds * 1000, 2),
+            'db_queries': self.queries,
+            'db_ms': round(self.query_seconds * 1000, 2),
+            'render_ms': round(self.render_seconds * 1000, 2) if self.render_seconds is not None else None,
+            'rendition_lookups': self.rendition_lookups,
+            'renditions_created': self.renditions_created,
+        }
+
+    def server_timing(self, total_seconds, page_cache=None):
+        """Server-Timing header value"""
+        metrics = [
+            f'total;dur={total_seconds * 1000:.1f}',
+            f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        if self.render_seconds is not None:
+            metrics.append(f'render;dur={self.render_seconds * 1000:.1f}')
+        if self.rendition_lookups or self.renditions_created:
+            metrics.append(
+                f'renditions;desc="{self.rendition_lookups} lookups, {self.renditions_created} created"'
+            )
+        if page_cache:
+            metrics.append(f'cache;desc="{page_cache}"')
+        return ', '.join(metrics)
+
+
+# Before http_cache's hook, which may answer with a 304 and skip the rest
+@hooks.register('before_serve_page', order=-1)
+def record_page_type(page, request, serve_args, serve_kwargs):
+    metrics = getattr(request, 'perf_metrics', None)
+    if metrics is not None:
+        metrics.page_type = page._meta.label
+
+
+class PerformanceMiddleware:
+    """Record RequestMetrics, add the Server-Timing header and log them"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rendition_table = get_image_model().get_rendition_model()._meta.db_table
+
+    def __call__(self, request):
+        if request.path.startswith(settings.STATIC_URL):
+            return self.get_response(request)
+
+        metrics = request.perf_metrics = RequestMetrics(self.rendition_table)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        total_seconds = time.perf_counter() - metrics.start
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total_seconds, response.get('X-Page-Cache'))
+
+        if total_seconds * 1000 >= settings.PERF_SLOW_REQUEST_MS:
+            logger.warning({
+                **metrics.as_dict(request, response, total_seconds),
+                'slow': True,
+                'top_queries': metrics.top_queries(settings.PERF_SLOW_QUERIES),
+            })
+        elif random.random() < settings.PERF_LOG_SAMPLE_RATE:
+            logger.info(metrics.as_dict(request, response, total_seconds))
+        return response
+
+    def process_template_response(self, request, response):
+        # Called last of the middleware, right before the response is rendered
+        metrics = getattr(request, 'perf_metrics', None)
+        if metrics is not None:
+            metrics.render_start = time.perf_counter()
+            response.add_post_render_callback(metrics.rendered)
+        return response
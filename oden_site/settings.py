@@ -59,8 +59,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware
+    'oden_site.perf.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Below WhiteNoise, which serves its own precompressed static files
+    'oden_site.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,6 +72,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     
+    'oden_site.page_cache.PageCacheMiddleware',
+    'oden_site.http_cache.PageCacheHeadersMiddleware',
     'wagtail.contrib.redirects.middleware.RedirectMiddleware',
 ]
 
@@ -116,6 +122,110 @@ else:
     }
 
 
+# Caches
+# The 'pages' cache holds rendered pages for anonymous visitors (see
+# oden_site/page_cache.py) and 'search' the product search index. Both are
+# invalidated by signals in the process that changes a page, so they must
+# be shared by gunicorn's workers and the import worker.
+# PAGE_CACHE_BACKEND picks where they are stored: 'db' (the tables are
+# created by `migrate`, and by `createcachetable`, which boot runs) or 'file'
+# (under PAGE_CACHE_LOCATION, on a disk every process shares). 'locmem'
+# keeps a copy per process, so it is only for a single process such as
+# runserver; gunicorn.conf.py refuses to start with it.
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'db')
+PAGE_CACHE_LOCATION = os.environ.get('PAGE_CACHE_LOCATION', os.path.join(BASE_DIR, 'page_cache'))
+
+# Part of every page ETag, so browsers refetch pages after a deploy, and of
+# the shared cache keys, as those caches outlive a deploy
+PAGE_ETAG_VERSION = os.environ.get('RAILWAY_GIT_COMMIT_SHA', '')
+
+
+def cache_backend(name):
+    """Settings of the cache called name on PAGE_CACHE_BACKEND"""
+    return {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': name,
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(PAGE_CACHE_LOCATION, name),
+        },
+        'db': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': f'{name}_cache',
+        },
+    }[PAGE_CACHE_BACKEND] | {'KEY_PREFIX': PAGE_ETAG_VERSION}
+
+
+CACHES = {
+    # Wagtail's site root paths and other small lookups made many times per
+    # request, which are cheapest in memory
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': cache_backend('search'),
+    'pages': {
+        **cache_backend('page'),
+        # Entries are deleted when pages are published; the timeout is a backstop
+        'TIMEOUT': int(os.environ.get('PAGE_CACHE_TIMEOUT', 24 * 60 * 60)),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Page types whose rendered responses are cached
+PAGE_CACHE_PAGE_TYPES = [
+    'home.HomePage',
+    'products.ProductsListingPage',
+    'products.ProductIndexPage',
+    'products.ProductPage',
+]
+
+# Cache-Control of anonymous page responses by page type, which are also
+# sent with an ETag and Last-Modified (see oden_site/http_cache.py).
+# s_maxage is for shared caches such as a CDN, which may keep serving a
+# stale copy for stale_while_revalidate seconds while they refetch it.
+PAGE_CACHE_CONTROL = {
+    'home.HomePage': {'max_age': 0, 's_maxage': 300, 'stale_while_revalidate': 3600},
+    'home.AboutPage': {'max_age': 300, 's_maxage': 3600, 'stale_while_revalidate': 86400},
+    'products.ProductsListingPage': {'max_age': 0, 's_maxage': 300, 'stale_while_revalidate': 3600},
+    'products.ProductIndexPage': {'max_age': 0, 's_maxage': 300, 'stale_while_revalidate': 3600},
+    'products.ProductPage': {'max_age': 300, 's_maxage': 3600, 'stale_while_revalidate': 86400},
+}
+
+# Inline each page type's above-the-fold CSS and load main.css without
+# blocking rendering (see oden_site/critical_css.py). The critical CSS is
+# regenerated with `manage.py extract_critical_css` after changing main.css.
+CRITICAL_CSS = os.environ.get('CRITICAL_CSS', 'True') == 'True'
+
+# Per-request timings (see oden_site/perf.py): sent as a Server-Timing
+# header, and logged as JSON for a sample of requests and for every request
+# slower than PERF_SLOW_REQUEST_MS, with its most expensive queries
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'True') == 'True'
+PERF_LOG_SAMPLE_RATE = float(os.environ.get('PERF_LOG_SAMPLE_RATE', '0.1'))
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+PERF_SLOW_QUERIES = 5
+
+# The performance log goes to stdout with gunicorn's access log
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'oden_site.json_logging.JsonFormatter'},
+    },
+    'handlers': {
+        'perf': {
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'oden_site.perf': {'handlers': ['perf'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -158,7 +268,8 @@ STATICFILES_DIRS = [
 ]
 
 # WhiteNoise for serving static files in production
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Minified, fingerprinted and compressed (see oden_site/storage.py)
+STATICFILES_STORAGE = 'oden_site.storage.MinifiedManifestStaticFilesStorage'
 
 # Media files - Use Cloudinary if configured, otherwise local storage
 CLOUDINARY_STORAGE = {
@@ -182,6 +293,20 @@ else:
 
 WAGTAIL_SITE_NAME = "ODENN Outdoor Products"
 
+# Responsive images are served as AVIF and WebP with a JPEG fallback (see
+# products/renditions.py). These qualities look about the same as JPEG at
+# Wagtail's default of 85, at a fraction of the size.
+WAGTAILIMAGES_AVIF_QUALITY = 60
+WAGTAILIMAGES_WEBP_QUALITY = 75
+
+# Product search uses the database backend: SQLite FTS locally and
+# PostgreSQL full-text search in production
+WAGTAILSEARCH_BACKENDS = {
+    'default': {
+        'BACKEND': 'wagtail.search.backends.database',
+    }
+}
+
 BASE_URL = os.environ.get('BASE_URL', 'http://localhost:8000')
 WAGTAILADMIN_BASE_URL = os.environ.get('WAGTAILADMIN_BASE_URL', BASE_URL)
 
@@ -195,7 +320,10 @@ else:
 
 # Static site generation settings
 BAKERY_VIEWS = (
-    'wagtailbakery.views.AllPublishedPagesView',
+    # wagtailbakery's AllPublishedPagesView, rendering pages for a static site
+    'oden_site.static_build.IncrementalPublishedPagesView',
+    # The product search index, which static builds search in the browser
+    'products.views.SearchIndexBuildView',
 )
 
 BUILD_DIR = os.path.join(BASE_DIR, 'build')
@@ -0,0 +1,462 @@
+"""
+Incremental static builds on top of wagtail-bakery.
+
+`manage.py build` re-renders every published page into BUILD_DIR. The
+build_incremental command keeps a manifest in BUILD_DIR of the pages it
+built (page id -> url, tree path, last_published_at and content hash) and
+on each run only:
+
+- renders pages that are new, were published since the last build, moved
+  or lost their output file, plus their ancestors, which list them;
+- deletes the output of pages that are no longer published, and renders
+  their ancestors;
+- writes files whose content hash changed, and compresses them (see
+  compression.py).
+
+Every page is rendered again when the templates, the critical CSS or the
+static files manifest (the fingerprinted names of main.css and site.js)
+changed since the last build, as their hash is kept in the manifest too.
+
+The other BAKERY_VIEWS, such as the product search index, are built every
+time, as `manage.py build` does.
+
+Pages can be rendered by a pool of worker processes (build_parallel, or
+build_incremental --workers). The manifest also records each page's type and
+render time, which the next build uses to share the work out evenly.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from collections import defaultdict
+from urllib.parse import unquote
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.test.client import RequestFactory
+from django.urls import get_callable
+from wagtail.models import Page, Site
+from wagtailbakery.views import AllPublishedPagesView
+
+from .compression import compress_build
+from .critical_css import CRITICAL_DIR
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 1
+REPORT_NAME = '.build-report.json'
+
+# Estimated render time of a page type in seconds, used to balance the work
+# between workers until a build has measured it. The listing and category
+# pages render every category or product under them.
+DEFAULT_PAGE_COSTS = {
+    'products.ProductsListingPage': 0.5,
+    'products.ProductIndexPage': 0.2,
+    'home.HomePage': 0.1,
+}
+DEFAULT_PAGE_COST = 0.02
+
+# Batches handed to each worker, on average. More batches even out bad
+# estimates at the cost of more round trips to the pool.
+BATCHES_PER_WORKER = 8
+
+# Pages fetched from the database at once by a worker
+FETCH_SIZE = 100
+
+
+def load_manifest(build_dir):
+    """
+    Return the manifest's page entries keyed by page id and the templates
+    hash it was built with, or ({}, None) if there is none
+    """
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}, None
+    pages = {int(page_id): entry for page_id, entry in manifest['pages'].items()}
+    return pages, manifest.get('templates')
+
+
+def save_manifest(build_dir, pages, templates_hash):
+    """Write the manifest atomically, so an interrupted build leaves the old one"""
+    path = os.path.join(build_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(
+            {'version': MANIFEST_VERSION, 'templates': templates_hash, 'pages': pages},
+            f, separators=(',', ':'),
+        )
+    os.replace(path + '.tmp', path)
+
+
+def get_template_dirs():
+    """The template directories of the project and its apps, and the critical CSS directory"""
+    base_dir = os.path.join(settings.BASE_DIR, '')
+    dirs = [directory for config in settings.TEMPLATES for directory in config['DIRS']]
+    dirs += [
+        os.path.join(app.path, 'templates')
+        for app in apps.get_app_configs() if app.path.startswith(base_dir)
+    ]
+    dirs.append(os.path.join(settings.STATICFILES_DIRS[0], CRITICAL_DIR))
+    return dirs
+
+
+def get_templates_hash():
+    """
+    Hash of what every page's output depends on besides its content: the
+    project's templates, the critical CSS and the static files manifest
+    """
+    digest = hashlib.sha256()
+    for directory in get_template_dirs():
+        for root, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    # Only the manifest storage fingerprints file names
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name and staticfiles_storage.exists(manifest_name):
+        with staticfiles_storage.open(manifest_name) as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_page_type(page):
+    """'app_label.ModelName' of a page, from its cached content type"""
+    return ContentType.objects.get_for_id(page.content_type_id).model_class()._meta.label
+
+
+def get_output_path(build_dir, url):
+    """File a page URL is built to, as in WagtailBakeryView.get_build_path()"""
+    return os.path.join(build_dir, unquote(url.lstrip('/')), 'index.html')
+
+
+def delete_output(build_dir, url):
+    """Delete a page's built file, and its directory if nothing else is left in it"""
+    path = get_output_path(build_dir, url)
+    for name in (path, path + '.gz', path + '.br'):
+        if os.path.exists(name):
+            os.remove(name)
+    try:
+        os.removedirs(os.path.dirname(path))
+    except OSError:
+        # Not empty: the page has children, or it is the build directory itself
+        pass
+
+
+class IncrementalPublishedPagesView(AllPublishedPagesView):
+    """
+    AllPublishedPagesView that only builds the pages it is given and skips
+    writing files whose content has not changed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written = 0
+        self.unchanged = 0
+
+    def get_content(self, obj):
+        # Lets pages render for a static site, e.g. ProductIndexPage without pagination
+        self.request.is_static_build = True
+        return super().get_content(obj)
+
+    def get_page_urls(self):
+        """
+        Return (page, url) for every page the full build would render.
+
+        URLs are worked out from url_path relative to the site root, like
+        Page.get_url_parts() does, without a query per page.
+        """
+        root_url_path = Site.objects.get(is_default_site=True).root_page.url_path
+        pages = self.get_queryset().only(
+            'id', 'path', 'depth', 'url_path', 'last_published_at', 'content_type'
+        ).order_by('path')
+        return [
+            (page, '/' + page.url_path[len(root_url_path):])
+            for page in pages if page.url_path.startswith(root_url_path)
+        ]
+
+    def build_page(self, page, previous_hash=None):
+        """
+        Render page and write it out if its content changed.
+
+        Returns (content hash, whether the file was written).
+        """
+        page = page.specific
+        self.request = RequestFactory(SERVER_NAME=page.get_site().hostname).get(self.get_url(page))
+        self.set_kwargs(page)
+        content = self.get_content(page)
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.get_build_path(page)
+        if content_hash == previous_hash and os.path.exists(path):
+            self.unchanged += 1
+            return content_hash, False
+        self.build_file(path, content)
+        self.written += 1
+        return content_hash, True
+
+
+def plan_build(page_urls, manifest, build_dir, rebuild_all=False):
+    """
+    Work out what an incremental build has to do.
+
+    Returns (pages to render, manifest entries whose output must be deleted).
+    """
+    live = {page.pk: (page, url) for page, url in page_urls}
+    by_path = {page.path: page for page, url in page_urls}
+
+    changed_paths = set()
+    removed = []
+    for page, url in page_urls:
+        entry = manifest.get(page.pk)
+        published = page.last_published_at.isoformat() if page.last_published_at else None
+        if (
+            rebuild_all
+            or entry is None
+            or entry['url'] != url
+            or entry['published'] != published
+            or not os.path.exists(get_output_path(build_dir, url))
+        ):
+            changed_paths.add(page.path)
+            if entry is not None and entry['url'] != url:
+                # Moved or renamed: its old output goes too
+                removed.append(entry)
+    for page_id, entry in manifest.items():
+        if page_id not in live:
+            removed.append(entry)
+            changed_paths.add(entry['path'])
+
+    # Ancestors list their children, so they are rendered again too
+    render_paths = set()
+    for path in changed_paths:
+        for end in range(Page.steplen, len(path) + 1, Page.steplen):
+            if path[:end] in by_path:
+                render_paths.add(path[:end])
+    return [by_path[path] for path in sorted(render_paths)], removed
+
+
+def page_type_costs(manifest):
+    """Estimated render time of each page type: the last build's mean, or the defaults"""
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    for entry in manifest.values():
+        if entry.get('type') and entry.get('seconds') is not None:
+            totals[entry['type']] += entry['seconds']
+            counts[entry['type']] += 1
+    costs = dict(DEFAULT_PAGE_COSTS)
+    costs.update({page_type: totals[page_type] / counts[page_type] for page_type in counts})
+    return costs
+
+
+def make_batches(pages, costs, workers):
+    """
+    Split pages into batches of page ids of about equal estimated cost.
+
+    Batches come out heaviest first and the pool hands the next one to
+    whichever worker is free, so the listing and category pages are started
+    early instead of leaving one worker rendering them while the rest idle.
+    A page costlier than a batch gets a batch of its own.
+    """
+    weighted = sorted(
+        ((costs.get(get_page_type(page), DEFAULT_PAGE_COST), page.pk) for page in pages),
+        reverse=True,
+    )
+    target = sum(cost for cost, page_id in weighted) / (workers * BATCHES_PER_WORKER)
+    batches = []
+    batch = []
+    batch_cost = 0
+    for cost, page_id in weighted:
+        batch.append(page_id)
+        batch_cost += cost
+        if batch_cost >= target:
+            batches.append(batch)
+            batch = []
+            batch_cost = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# The view of the current process, set up by init_worker()
+_worker_view = None
+
+
+def init_worker(build_dir):
+    """Pool initializer; also run in-process for a serial build"""
+    global _worker_view
+    settings.BUILD_DIR = build_dir
+    _worker_view = IncrementalPublishedPagesView()
+
+
+def render_batch(batch):
+    """
+    Render a batch of (page id, previous hash) in the current process.
+
+    Returns (page id, content hash, render seconds, written) for each page.
+    """
+    results = []
+    for start in range(0, len(batch), FETCH_SIZE):
+        chunk = dict(batch[start:start + FETCH_SIZE])
+        for page in Page.objects.filter(pk__in=chunk).specific():
+            page_start = time.perf_counter()
+            content_hash, written = _worker_view.build_page(page, previous_hash=chunk[page.pk])
+            results.append((page.pk, content_hash, time.perf_counter() - page_start, written))
+    return results
+
+
+def render_pages(build_dir, pages, hashes, costs, workers=1):
+    """
+    Render pages into build_dir, in a pool of worker processes if workers > 1.
+
+    Workers are forked after the parent closes its database connections, so
+    each opens its own, and keep their own template and rendition caches.
+    Returns {page id: (content hash, render seconds, written)}.
+    """
+    batches = [
+        [(page_id, hashes.get(page_id)) for page_id in batch]
+        for batch in make_batches(pages, costs, workers)
+    ]
+    if workers <= 1:
+        init_worker(build_dir)
+        results = map(render_batch, batches)
+        return {page_id: result for batch in results for page_id, *result in batch}
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, initializer=init_worker, initargs=(build_dir,)) as pool:
+        results = pool.imap_unordered(render_batch, batches)
+        return {page_id: result for batch in results for page_id, *result in batch}
+
+
+def build_other_views(build_dir):
+    """Build the BAKERY_VIEWS other than the pages into build_dir"""
+    settings.BUILD_DIR = build_dir
+    for view_name in settings.BAKERY_VIEWS:
+        view = get_callable(view_name)
+        if not issubclass(view, AllPublishedPagesView):
+            view().build_method()
+
+
+def build_report(page_urls, rendered, workers, seconds):
+    """
+    Summarise render times: per page, per page type and the speedup over a
+    serial build, estimated as the sum of the render times. The estimate is
+    too high when there are more workers than CPUs, as each page then takes
+    longer; build_parallel --compare-serial measures it instead.
+    """
+    pages = sorted(
+        (
+            {'id': page.pk, 'url': url, 'type': get_page_type(page), 'seconds': round(rendered[page.pk][1], 4)}
+            for page, url in page_urls if page.pk in rendered
+        ),
+        key=lambda row: -row['seconds'],
+    )
+    by_type = defaultdict(list)
+    for row in pages:
+        by_type[row['type']].append(row['seconds'])
+    render_seconds = sum(row['seconds'] for row in pages)
+    return {
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'render_seconds': round(render_seconds, 3),
+        'speedup': round(render_seconds / seconds, 2) if seconds else None,
+        'types': {
+            page_type: {
+                'pages': len(times),
+                'seconds': round(sum(times), 3),
+                'mean': round(sum(times) / len(times), 4),
+                'max': times[0],
+            }
+            for page_type, times in sorted(by_type.items())
+        },
+        'page_times': pages,
+    }
+
+
+def save_report(build_dir, report):
+    with open(os.path.join(build_dir, REPORT_NAME), 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+def build_pages(build_dir, rebuild_all=False, workers=1):
+    """
+    Bring build_dir up to date with the published pages.
+
+    Returns the build report (see build_report()) with counts of the
+    rendered, written, unchanged and deleted pages and the compression
+    counts (see compression.compress_build()) added.
+    """
+    start = time.perf_counter()
+    os.makedirs(build_dir, exist_ok=True)
+    manifest, previous_templates_hash = load_manifest(build_dir)
+    templates_hash = get_templates_hash()
+
+    page_urls = IncrementalPublishedPagesView().get_page_urls()
+    to_render, removed = plan_build(
+        page_urls, manifest, build_dir,
+        rebuild_all=rebuild_all or templates_hash != previous_templates_hash,
+    )
+
+    for entry in removed:
+        delete_output(build_dir, entry['url'])
+
+    hashes = {page_id: entry.get('hash') for page_id, entry in manifest.items()}
+    rendered = render_pages(build_dir, to_render, hashes, page_type_costs(manifest), workers=workers)
+
+    entries = {}
+    for page, url in page_urls:
+        entry = manifest.get(page.pk, {})
+        content_hash, seconds, written = rendered.get(page.pk, (entry.get('hash'), entry.get('seconds'), False))
+        entries[page.pk] = {
+            'url': url,
+            'path': page.path,
+            'published': page.last_published_at.isoformat() if page.last_published_at else None,
+            'hash': content_hash,
+            'type': get_page_type(page),
+            'seconds': round(seconds, 4) if seconds is not None else None,
+        }
+    save_manifest(build_dir, entries, templates_hash)
+    build_other_views(build_dir)
+    compression = compress_build(build_dir)
+
+    report = build_report(page_urls, rendered, workers, time.perf_counter() - start)
+    written = sum(1 for content_hash, seconds, written in rendered.values() if written)
+    report.update({
+        'total': len(page_urls),
+        'rendered': len(to_render),
+        'written': written,
+        'unchanged': len(to_render) - written,
+        'deleted': len(removed),
+        'compression': compression,
+    })
+    save_report(build_dir, report)
+    return report
+
+
+def build_incremental(build_dir=None, rebuild_all=False, workers=1):
+    """Bring BUILD_DIR up to date with the published pages; see build_pages()"""
+    return build_pages(build_dir or settings.BUILD_DIR, rebuild_all=rebuild_all, workers=workers)
+
+
+def swap_build_dir(new_dir, build_dir):
+    """
+    Replace build_dir with the finished build in new_dir.
+
+    Both are renames within the same parent directory, so build_dir is
+    never seen half written, only missing for the moment between the two
+    renames. The old build is deleted last.
+    """
+    old_dir = build_dir.rstrip(os.sep) + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(build_dir):
+        os.rename(build_dir, old_dir)
+    os.rename(new_dir, build_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
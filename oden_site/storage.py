@@ -0,0 +1,46 @@
+"""
+Static files storage that minifies the site's own CSS and JavaScript.
+
+collectstatic copies the files into STATIC_ROOT, this storage minifies the
+copies of the files under MINIFY_PREFIXES (the sources in static/ are left
+readable), and WhiteNoise's CompressedManifestStaticFilesStorage then
+fingerprints them with a hash of their content and writes compressed copies.
+Templates get the fingerprinted names from {% static %}, so they can be
+cached by browsers for good.
+"""
+import rcssmin
+import rjsmin
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# Only the site's own files; the admin's are already minified
+MINIFY_PREFIXES = ('css/', 'js/')
+
+MINIFIERS = {
+    '.css': rcssmin.cssmin,
+    '.js': rjsmin.jsmin,
+}
+
+
+class MinifiedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """CompressedManifestStaticFilesStorage that minifies our CSS and JavaScript first"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            for path in paths:
+                if self.minify(path):
+                    # Hash and compress the minified copy rather than the source
+                    paths[path] = (self, path)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def minify(self, path):
+        """Minify the collected copy of path in place if it is one of ours; returns whether it was"""
+        minifier = next((m for ext, m in MINIFIERS.items() if path.endswith(ext)), None)
+        if minifier is None or not path.startswith(MINIFY_PREFIXES):
+            return False
+        with self.open(path) as f:
+            source = f.read().decode('utf-8')
+        self.delete(path)
+        self._save(path, ContentFile(minifier(source).encode('utf-8')))
+        return True
@@ -6,13 +6,22 @@ from django.contrib import admin
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail import urls as wagtail_urls
 from wagtail.documents import urls as wagtaildocs_urls
-from products.admin import import_products_csv
+from products.admin import import_products_csv, import_products_job, import_products_job_status
+from products.views import product_search, search_index
 
 urlpatterns = [
     path('django-admin/', admin.site.urls),
     path('admin/products/import-csv/', import_products_csv, name='import_products_csv'),
+    path('admin/products/import-csv/<int:job_id>/', import_products_job, name='import_products_job'),
+    path(
+        'admin/products/import-csv/<int:job_id>/status/',
+        import_products_job_status,
+        name='import_products_job_status',
+    ),
     path('admin/', include(wagtailadmin_urls)),
     path('documents/', include(wagtaildocs_urls)),
+    path('products/search/', product_search, name='products_search'),
+    path('products/search-index/<str:version>.json', search_index, name='products_search_index'),
     path('', include(wagtail_urls)),
 ]
 
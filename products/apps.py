@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ProductsConfig(AppConfig):
+    name = 'products'
+
+    def ready(self):
+        # Connect signal handlers that keep derived catalog data up to date
+        from . import signals  # noqa: F401
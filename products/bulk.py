@@ -0,0 +1,222 @@
+"""
+Bulk page tree helpers for large product imports.
+
+Wagtail's add_child() and save_revision().publish() do several queries per
+page (treebeard path lookup, insert, revision, publish, log entry, signals).
+These helpers do the same work for many pages of one type at once: paths are
+allocated in memory, rows are written with bulk inserts and set-based
+updates and revisions and log entries are inserted in batches.
+
+Nothing here sends page_published/page_unpublished or indexes pages for
+search; callers are expected to do that once for the whole batch.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import CharField, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Substr
+from django.utils import timezone
+from wagtail.models import Page, PageLogEntry, Revision
+
+BATCH_SIZE = 500
+
+
+class ChildPathAllocator:
+    """
+    Hands out treebeard paths for new children of known parent pages.
+
+    The last child path of every parent is read once, so allocating paths for
+    any number of new siblings does not query the database again.
+    """
+
+    def __init__(self, parents):
+        self.parents = {parent.path: parent for parent in parents}
+        self.last_steps = {path: 0 for path in self.parents}
+        self.new_children = {path: 0 for path in self.parents}
+
+        # One query per parent depth: the highest child path under each parent
+        depths = {parent.depth for parent in parents}
+        for depth in depths:
+            paths = [parent.path for parent in parents if parent.depth == depth]
+            last_children = Page.objects.filter(depth=depth + 1).annotate(
+                parent_path=Substr('path', 1, depth * Page.steplen)
+            ).filter(parent_path__in=paths).values('parent_path').annotate(last_path=Max('path'))
+            for row in last_children:
+                self.last_steps[row['parent_path']] = int(row['last_path'][-Page.steplen:], len(Page.alphabet))
+
+    def add_parent(self, parent):
+        """Register a parent page that was created after the allocator"""
+        self.parents[parent.path] = parent
+        self.last_steps.setdefault(parent.path, 0)
+        self.new_children.setdefault(parent.path, 0)
+
+    def position(self, page, parent):
+        """Set the tree position fields of an unsaved page as the next child of parent"""
+        self.last_steps[parent.path] += 1
+        self.new_children[parent.path] += 1
+        page.depth = parent.depth + 1
+        page.path = Page._get_path(parent.path, page.depth, self.last_steps[parent.path])
+        page.url_path = f'{parent.url_path}{page.slug}/'
+        page.numchild = 0
+        # New pages take their parent's locale, as in Page.get_default_locale()
+        page.locale_id = parent.locale_id
+        return page
+
+    def update_numchild(self):
+        """Bump numchild on every parent that received new children"""
+        for path, count in self.new_children.items():
+            if count:
+                parent = self.parents[path]
+                parent.numchild += count
+                Page.objects.filter(pk=parent.pk).update(numchild=parent.numchild)
+                self.new_children[path] = 0
+
+
+def bulk_create_pages(pages, batch_size=BATCH_SIZE):
+    """
+    Insert already-positioned pages of one specific type in bulk.
+
+    Django's bulk_create() refuses multi-table inherited models, so the
+    wagtailcore_page rows are bulk created first and the specific rows are
+    then inserted with the primary keys that came back.
+    """
+    if not pages:
+        return pages
+
+    model = type(pages[0])
+    content_type = ContentType.objects.get_for_model(model)
+    for page in pages:
+        page.content_type = content_type
+        if page.locale_id is None:
+            page.locale = page.get_default_locale()
+        if not page.draft_title:
+            page.draft_title = page.title
+
+    base_fields = [field.attname for field in Page._meta.concrete_fields if not field.primary_key]
+    base_pages = Page.objects.bulk_create(
+        [Page(**{name: getattr(page, name) for name in base_fields}) for page in pages],
+        batch_size=batch_size,
+    )
+    for page, base_page in zip(pages, base_pages):
+        page.id = page.page_ptr_id = base_page.pk
+
+    fields = model._meta.local_concrete_fields
+    for page in pages:
+        # Copy the ids of related pages saved since they were assigned, as bulk_create() does
+        page._prepare_related_fields_for_save(operation_name='bulk_create_pages')
+    for start in range(0, len(pages), batch_size):
+        model._base_manager._insert(pages[start:start + batch_size], fields=fields)
+    return pages
+
+
+def bulk_publish(pages, fields=(), user=None, batch_size=BATCH_SIZE):
+    """
+    Save and publish a new revision for each page, like save_revision().publish().
+
+    pages must be saved pages of one specific type; fields lists any of its
+    own fields that changed and need writing. Revisions and 'wagtail.publish'
+    log entries are bulk inserted. The publish state is the same for every
+    page, so it is written with one UPDATE per batch, with the revision
+    pointers filled in from a subquery on the new revisions.
+    """
+    if not pages:
+        return pages
+
+    model = type(pages[0])
+    content_type = ContentType.objects.get_for_model(model)
+    base_content_type = ContentType.objects.get_for_model(Page)
+    now = timezone.now()
+
+    revisions = []
+    for page in pages:
+        page.live = True
+        page.has_unpublished_changes = False
+        page.expired = False
+        page.draft_title = page.title
+        page.last_published_at = now
+        page.latest_revision_created_at = now
+        if page.first_published_at is None:
+            page.first_published_at = now
+        revisions.append(Revision(
+            content_type=content_type,
+            base_content_type=base_content_type,
+            object_id=str(page.pk),
+            user=user,
+            created_at=now,
+            content=page.serializable_data(),
+            object_str=str(page),
+        ))
+    Revision.objects.bulk_create(revisions, batch_size=batch_size)
+    # Keep only the ids, so long imports don't hold every revision's content in memory
+    for page, revision in zip(pages, revisions):
+        page.latest_revision_id = page.live_revision_id = revision.pk
+
+    if fields:
+        model.objects.bulk_update(pages, fields, batch_size=batch_size)
+
+    latest_revision = Revision.objects.filter(
+        base_content_type=base_content_type,
+        object_id=Cast(OuterRef('pk'), output_field=CharField()),
+    ).order_by('-pk').values('pk')[:1]
+    for start in range(0, len(pages), batch_size):
+        Page.objects.filter(pk__in=[page.pk for page in pages[start:start + batch_size]]).update(
+            live=True,
+            has_unpublished_changes=False,
+            expired=False,
+            draft_title=F('title'),
+            first_published_at=Coalesce('first_published_at', Value(now)),
+            last_published_at=now,
+            latest_revision=Subquery(latest_revision),
+            latest_revision_created_at=now,
+            live_revision=Subquery(latest_revision),
+        )
+
+    PageLogEntry.objects.bulk_create([
+        PageLogEntry(
+            content_type=content_type,
+            page=page,
+            label=page.get_admin_display_title(),
+            action='wagtail.publish',
+            timestamp=now,
+            user=user,
+            revision_id=page.latest_revision_id,
+            content_changed=True,
+        )
+        for page in pages
+    ], batch_size=batch_size)
+    return pages
+
+
+def bulk_unpublish(pages, user=None, batch_size=BATCH_SIZE):
+    """
+    Unpublish pages of one specific type, like page.unpublish().
+
+    The pages keep their revisions and stay in the search index, which only
+    returns live pages. page_unpublished is not sent.
+    """
+    if not pages:
+        return pages
+
+    content_type = ContentType.objects.get_for_model(type(pages[0]))
+    now = timezone.now()
+    for start in range(0, len(pages), batch_size):
+        Page.objects.filter(pk__in=[page.pk for page in pages[start:start + batch_size]]).update(
+            live=False,
+            has_unpublished_changes=True,
+            live_revision=None,
+        )
+    for page in pages:
+        page.live = False
+        page.has_unpublished_changes = True
+        page.live_revision_id = None
+
+    PageLogEntry.objects.bulk_create([
+        PageLogEntry(
+            content_type=content_type,
+            page=page,
+            label=page.get_admin_display_title(),
+            action='wagtail.unpublish',
+            timestamp=now,
+            user=user,
+        )
+        for page in pages
+    ], batch_size=batch_size)
+    return pages
@@ -0,0 +1,97 @@
+"""
+Catalog loading helpers for the products listing page.
+
+The listing page search needs every live product together with its category
+title, thumbnail and page URL. Resolving those per product (get_parent(),
+.url, rendition lookups) costs several queries per product, so this module
+loads the whole catalog in a fixed number of queries instead.
+"""
+from django.db.models import Prefetch
+from wagtail.images import get_image_model
+from wagtail.images.models import SourceImageIOError
+from wagtail.models import Page
+
+from .models import ProductPage
+
+# One of the product card renditions (see renditions.IMAGE_SETS), so search
+# results reuse them
+THUMBNAIL_SPEC = 'fill-400x300|format-webp'
+
+
+def get_live_products(root_page):
+    """Return live, public ProductPages below root_page with their images joined in"""
+    # The rich text description isn't shown, only its stored plain text summary
+    return ProductPage.objects.live().public().filter(
+        path__startswith=root_page.path
+    ).defer('description').select_related('image').order_by('title')
+
+
+def get_category_titles(products):
+    """Map the category id of each product to its title using a single query"""
+    category_ids = {product.category_id for product in products}
+    if not category_ids:
+        return {}
+    return dict(
+        Page.objects.filter(pk__in=category_ids).values_list('pk', 'title')
+    )
+
+
+def get_thumbnail_url(image):
+    """Return the thumbnail rendition URL for image, or '' if it has no usable file"""
+    if not image:
+        return ''
+    try:
+        return image.get_rendition(THUMBNAIL_SPEC).url
+    except SourceImageIOError:
+        return ''
+
+
+def with_thumbnails(queryset):
+    """Prefetch the thumbnail renditions for the images of a ProductPage queryset"""
+    Rendition = get_image_model().get_rendition_model()
+    return queryset.prefetch_related(
+        Prefetch(
+            'image__renditions',
+            queryset=Rendition.objects.filter(filter_spec=THUMBNAIL_SPEC),
+            to_attr='prefetched_renditions',
+        )
+    )
+
+
+def serialize_products(products, request=None):
+    """
+    Return compact dicts for already-loaded products.
+
+    products should come from a queryset passed through with_thumbnails(),
+    so only the category title lookup costs an extra query.
+    """
+    category_titles = get_category_titles(products)
+
+    products_data = []
+    for product in products:
+        products_data.append({
+            'id': product.id,
+            'title': product.title,
+            'sku': product.sku or '',
+            'category_id': product.category_id,
+            'category': category_titles.get(product.category_id, ''),
+            'summary': product.description_summary,
+            'price': str(product.price),
+            'url': product.get_url(request),
+            'thumbnail': get_thumbnail_url(product.image),
+        })
+    return products_data
+
+
+def load_catalog(root_page, request=None):
+    """
+    Return a list of compact product dicts for every live product below root_page.
+
+    Query count is constant regardless of catalog size: one for the products
+    (with images), one for their thumbnail renditions, one for view
+    restrictions and one for the category titles. Page URLs are built from
+    the cached site root paths. Only thumbnails that have never been
+    generated cost extra work.
+    """
+    products = list(with_thumbnails(get_live_products(root_page)))
+    return serialize_products(products, request)
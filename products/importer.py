@@ -0,0 +1,578 @@
+"""
+Bulk CSV product import engine.
+
+Used by both the import_products management command and the admin CSV
+import view. Instead of looking up, creating and publishing pages row by row,
+every existing category and product under the products listing page is
+loaded into memory once, new pages are positioned in memory and all writes
+happen in bulk (see bulk.py).
+
+Rows are read as a stream and committed in chunks of CHUNK_SIZE rows, each
+in its own transaction. Progress is recorded on a ProductImport by row
+offset, so a failed import keeps the rows already committed and can be
+resumed from where it stopped.
+
+Imports are diff-based: a row whose product is already live at the same
+price is counted as unchanged and not written, so re-importing the same
+file creates no revisions. With unpublish_missing, live products that are
+not in the file are unpublished (retired) at the end.
+
+Rows can come from a file path, an uploaded or stored file, or any
+iterable of row dicts (see open_rows). Every import returns an
+ImportResult with counts, errors and the time spent in each phase.
+"""
+import codecs
+import csv
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Optional
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
+from wagtail.search.backends import get_search_backends
+
+from .bulk import ChildPathAllocator, bulk_create_pages, bulk_publish, bulk_unpublish
+from .models import ProductImport, ProductIndexPage, ProductPage, ProductsListingPage
+from .signals import products_imported
+
+REQUIRED_HEADERS = ('product_category', 'product', 'price')
+
+# Rows written per transaction
+CHUNK_SIZE = 1000
+
+# Imported prices are rounded to the precision they are stored with, and
+# must fit in the price column
+PRICE_FIELD = ProductPage._meta.get_field('price')
+PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+MAX_PRICE_DIGITS = PRICE_FIELD.max_digits
+
+
+class ProductImportError(Exception):
+    """Raised when an import cannot start, e.g. no Home Page or bad CSV headers"""
+    pass
+
+
+def make_slug(name):
+    """Slug used for imported categories and products"""
+    return name.lower().replace(' ', '-').replace('/', '-')
+
+
+def get_or_create_products_listing():
+    """Return the live Products Listing Page, creating it under the Home Page if needed"""
+    products_listing = ProductsListingPage.objects.live().first()
+    if not products_listing:
+        from home.models import HomePage
+        home_page = HomePage.objects.live().first()
+        if not home_page:
+            raise ProductImportError(
+                'Home Page must be created first. Please create a Home Page before importing products.'
+            )
+
+        products_listing = ProductsListingPage(
+            title="Products",
+            slug="products"
+        )
+        home_page.add_child(instance=products_listing)
+        products_listing.save_revision().publish()
+    return products_listing
+
+
+def validate_headers(fieldnames):
+    """Raise ProductImportError unless all required CSV columns are present"""
+    if not set(REQUIRED_HEADERS).issubset(fieldnames or []):
+        raise ProductImportError(
+            f'CSV must have columns: {", ".join(REQUIRED_HEADERS)}. '
+            f'Found: {", ".join(fieldnames or [])}'
+        )
+
+
+def read_csv_upload(uploaded_file):
+    """
+    Return a csv.DictReader streaming an uploaded file.
+
+    Lines are decoded as they are read from the upload's chunks, so the file
+    is never held in memory as a whole.
+    """
+    return csv.DictReader(codecs.iterdecode(uploaded_file, 'utf-8'))
+
+
+@contextmanager
+def open_rows(source):
+    """
+    Yield an iterator of CSV row dicts from a row source.
+
+    source may be a file path, a django File (an upload or a queued job's
+    stored CSV) or an iterable of row dicts. CSV headers are checked before
+    any row is read.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            csv_reader = csv.DictReader(f)
+            validate_headers(csv_reader.fieldnames)
+            yield csv_reader
+    elif isinstance(source, File):
+        with source.open('rb') as f:
+            csv_reader = read_csv_upload(f)
+            validate_headers(csv_reader.fieldnames)
+            yield csv_reader
+    else:
+        yield iter(source)
+
+
+def start_import(file_name, start_row=0, resume=False, **fields):
+    """
+    Create the ProductImport that records progress for a new import.
+
+    With resume, if the most recent import of a file with the same name
+    failed, it starts from the row offset where that import stopped and the
+    failed one is marked superseded. Extra fields are set on the record.
+    """
+    with transaction.atomic():
+        previous = None
+        if resume:
+            previous = ProductImport.objects.filter(file_name=file_name).order_by('-created_at', '-pk').first()
+        # Switched with a conditional UPDATE so two imports can't resume the same one
+        if previous is not None and ProductImport.objects.filter(
+            pk=previous.pk, status=ProductImport.FAILED
+        ).update(status=ProductImport.SUPERSEDED, updated_at=timezone.now()):
+            start_row = previous.rows_committed
+        else:
+            previous = None
+        record = ProductImport.objects.create(file_name=file_name, rows_committed=start_row, **fields)
+    if previous is not None:
+        # Only failed jobs are retried from their stored upload
+        ProductImport.objects.filter(pk=previous.pk).update(csv_data=None)
+    return record
+
+
+def claim_next_import():
+    """
+    Mark the oldest queued ProductImport as running and return it, or None.
+
+    Running jobs that haven't saved progress for ProductImport.STALE_AFTER
+    were stopped by a restart. The ones with a stored upload are claimed again
+    and resume from their last committed row; the others, run from the
+    command line, are marked failed so they can be resumed with --resume.
+
+    The status is switched with a conditional UPDATE, so when several
+    workers race for the same job only one of them gets it.
+    """
+    now = timezone.now()
+    stale = Q(status=ProductImport.RUNNING, updated_at__lt=now - ProductImport.STALE_AFTER)
+    ProductImport.objects.filter(stale, csv_data__isnull=True).update(
+        status=ProductImport.FAILED, error='The import stopped without finishing', updated_at=now,
+    )
+    # The upload is loaded by run_import, saving progress doesn't write it back
+    candidates = ProductImport.objects.filter(
+        Q(status=ProductImport.QUEUED) | stale
+    ).defer('csv_data').order_by('created_at')
+    for record in candidates[:10]:
+        claimed = ProductImport.objects.filter(
+            pk=record.pk, status=record.status, updated_at=record.updated_at
+        ).update(status=ProductImport.RUNNING, updated_at=now)
+        if claimed:
+            record.status = ProductImport.RUNNING
+            record.updated_at = now
+            return record
+    return None
+
+
+def run_import(record):
+    """Run a queued ProductImport from its stored CSV upload; used by the import_worker command"""
+    try:
+        csv_data = ProductImport.objects.values_list('csv_data', flat=True).get(pk=record.pk)
+        importer = ProductImporter(
+            get_or_create_products_listing(),
+            user=record.user,
+            unpublish_missing=record.unpublish_missing,
+            record=record,
+        )
+        importer.run(ContentFile(csv_data, name=record.file_name), start_row=record.rows_committed)
+    except Exception as e:
+        # The importer records its own failures; this catches the ones before it starts
+        if record.status != ProductImport.FAILED:
+            record.status = ProductImport.FAILED
+            record.error = str(e)
+            record.save(update_fields=['status', 'error', 'updated_at'])
+        return record
+    # The upload is kept after a failure so the job can be retried from where it stopped
+    ProductImport.objects.filter(pk=record.pk).update(csv_data=None)
+    return record
+
+
+def delete_old_uploads():
+    """
+    Delete the stored uploads of imports that failed more than
+    ProductImport.UPLOAD_RETENTION ago, which can then no longer be retried.
+    Returns how many were deleted.
+    """
+    return ProductImport.objects.filter(
+        status__in=[ProductImport.FAILED, ProductImport.SUPERSEDED],
+        updated_at__lt=timezone.now() - ProductImport.UPLOAD_RETENTION,
+        csv_data__isnull=False,
+    ).update(csv_data=None)
+
+
+# Phases of an import, timed separately in ImportResult.timings:
+# parse reads and validates rows, lookup matches them against the preloaded
+# catalog, write inserts pages and updates search, publish creates
+# revisions and publishes pages, and retire unpublishes missing products.
+PHASES = ('parse', 'lookup', 'write', 'publish', 'retire')
+
+
+@dataclass
+class ImportResult:
+    """Counts, errors and timings of one import run"""
+
+    created_categories: int = 0
+    created_products: int = 0
+    updated_products: int = 0
+    unchanged_products: int = 0
+    retired_products: int = 0
+    # Rows read by this run, and the row offset committed so far (including skipped rows)
+    rows: int = 0
+    rows_committed: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    timings: dict = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+    seconds_saved: Optional[float] = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def written_products(self):
+        return self.created_products + self.updated_products
+
+    @property
+    def write_seconds(self):
+        """Time spent writing and publishing the imported rows"""
+        return self.timings['write'] + self.timings['publish']
+
+    def counts(self):
+        return (self.created_categories, self.created_products, self.updated_products, self.unchanged_products)
+
+    def set_counts(self, counts):
+        self.created_categories, self.created_products, self.updated_products, self.unchanged_products = counts
+
+
+class ProductImporter:
+    """
+    Imports product rows under a Products Listing Page in bulk.
+
+    Usage:
+        record = start_import(file_name, resume=True)
+        importer = ProductImporter(products_listing, user=request.user, record=record)
+        result = importer.run(csv_path_or_file_or_rows, start_row=record.rows_committed)
+        result.created_products, result.rows_per_second, result.timings, ...
+    """
+
+    def __init__(self, products_listing, user=None, dry_run=False, chunk_size=CHUNK_SIZE,
+                 unpublish_missing=False, record=None):
+        self.products_listing = products_listing
+        self.user = user
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.unpublish_missing = unpublish_missing
+        self.record = record
+        self.result = ImportResult()
+        self.started = None
+
+    def elapsed(self):
+        """Seconds since the import started"""
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to result.timings[name]"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.result.timings[name] += time.perf_counter() - start
+
+    def estimate_seconds_saved(self):
+        """
+        Estimated time unchanged products would have taken to write, or None if unknown.
+
+        Uses the per-product write time of whichever of this run and the
+        recent imports wrote the most products, since small writes are
+        dominated by fixed per-chunk costs.
+        """
+        result = self.result
+        if not result.unchanged_products:
+            return 0.0
+        samples = [(result.written_products, result.write_seconds)]
+        for previous in ProductImport.objects.filter(
+            status=ProductImport.COMPLETE, write_seconds__gt=0
+        ).order_by('-created_at')[:20]:
+            samples.append((previous.created_products + previous.updated_products, previous.write_seconds))
+        written, write_seconds = max(samples)
+        if not written:
+            return None
+        return result.unchanged_products * write_seconds / written
+
+    def preload(self):
+        """Load every category and product under the listing page into lookup dicts"""
+        listing = self.products_listing
+
+        self.categories = {}
+        self.category_slugs = set()
+        category_ids = []
+        for category in ProductIndexPage.objects.filter(path__startswith=listing.path, depth=listing.depth + 1):
+            self.categories.setdefault(category.title, category)
+            self.category_slugs.add(category.slug)
+            category_ids.append(category.pk)
+
+        # Keyed by parent path so lookups match the row's category, like the old per-row queries did
+        self.products = {}
+        self.product_slugs = set()
+        # Existing products named in the file, for unpublish_missing
+        self.seen_products = set()
+        for product in ProductPage.objects.filter(category__in=category_ids):
+            parent_path = product.path[:-ProductPage.steplen]
+            self.products.setdefault((parent_path, product.title), product)
+            self.product_slugs.add((parent_path, product.slug))
+
+        self.allocator = ChildPathAllocator([listing, *self.categories.values()])
+        self.reset_chunk()
+
+    def reset_chunk(self):
+        """Forget the pages queued for writing by the previous chunk"""
+        self.new_categories = []
+        self.new_products = []
+        self.changed_products = {}
+
+    def parse_row(self, row_num, row):
+        """Return (category_name, product_name, price) or None after recording an error"""
+        category_name = (row.get('product_category') or '').strip()
+        product_name = (row.get('product') or '').strip()
+        price_str = (row.get('price') or '').strip()
+
+        if not category_name or not product_name or not price_str:
+            self.result.errors.append(f"Row {row_num}: Missing required field (product_category, product, or price)")
+            return None
+
+        try:
+            # Raises InvalidOperation for infinity and numbers too big to round
+            price = Decimal(price_str).quantize(PRICE_QUANTUM)
+        except (InvalidOperation, ValueError):
+            price = None
+        if price is None or price.is_nan():
+            self.result.errors.append(f"Row {row_num}: Invalid price '{price_str}'")
+            return None
+        if len(price.as_tuple().digits) > MAX_PRICE_DIGITS:
+            self.result.errors.append(
+                f"Row {row_num}: Price '{price_str}' has more than {MAX_PRICE_DIGITS} digits"
+            )
+            return None
+
+        return category_name, product_name, price
+
+    def get_or_add_category(self, row_num, category_name):
+        """Return the category page for category_name, queueing a new one if needed"""
+        category = self.categories.get(category_name)
+        if category:
+            return category
+
+        slug = make_slug(category_name)
+        if slug in self.category_slugs:
+            self.result.errors.append(f"Row {row_num}: The slug '{slug}' is already in use by another category")
+            return None
+
+        category = ProductIndexPage(title=category_name, slug=slug)
+        self.allocator.position(category, self.products_listing)
+        self.allocator.add_parent(category)
+        self.categories[category_name] = category
+        self.category_slugs.add(slug)
+        self.new_categories.append(category)
+        self.result.created_categories += 1
+        return category
+
+    def add_row(self, row_num, category_name, product_name, price):
+        """Apply one parsed CSV row to the in-memory catalog"""
+        category = self.get_or_add_category(row_num, category_name)
+        if category is None:
+            return
+
+        product = self.products.get((category.path, product_name))
+        if product:
+            if product.pk:
+                self.seen_products.add(product.pk)
+            if product.live and product.price == price:
+                self.result.unchanged_products += 1
+                return
+            product.price = price
+            if product.pk:
+                self.changed_products[product.pk] = product
+            self.result.updated_products += 1
+            return
+
+        slug = make_slug(product_name)
+        if (category.path, slug) in self.product_slugs:
+            self.result.errors.append(f"Row {row_num}: The slug '{slug}' is already in use within the parent page")
+            return
+
+        product = ProductPage(
+            title=product_name,
+            slug=slug,
+            price=price,
+            description=f"Product: {product_name}"
+        )
+        # Bulk inserts skip the pre_save signal that fills these in
+        product.update_catalog_fields(category)
+        self.allocator.position(product, category)
+        # New pages have no comments; setting this avoids a query per page when serialising revisions
+        product.wagtail_admin_comments = []
+        self.products[(category.path, product_name)] = product
+        self.product_slugs.add((category.path, slug))
+        self.new_products.append(product)
+        self.result.created_products += 1
+
+    def write(self):
+        """Insert new pages, then publish new and changed pages with batched revisions"""
+        products = self.new_products + list(self.changed_products.values())
+        if not self.new_categories and not products:
+            return
+
+        with self.phase('write'):
+            # Revisions serialise comments; existing pages load theirs in one query
+            prefetch_related_objects(list(self.changed_products.values()), 'wagtail_admin_comments')
+            for category in self.new_categories:
+                category.wagtail_admin_comments = []
+            bulk_create_pages(self.new_categories)
+            bulk_create_pages(self.new_products)
+            self.allocator.update_numchild()
+
+        with self.phase('publish'):
+            bulk_publish(self.new_categories, user=self.user)
+            bulk_publish(products, fields=['price'], user=self.user)
+
+        with self.phase('write'):
+            # Bulk writes bypass the per-page signals that keep search up to date
+            for backend in get_search_backends():
+                backend.add_bulk(ProductIndexPage, self.new_categories)
+                backend.add_bulk(ProductPage, products)
+            products_imported.send(sender=type(self), categories=self.new_categories, products=products)
+
+    def retire_missing(self, start_row):
+        """Unpublish live products that were not in the file"""
+        if start_row:
+            # The rows before start_row were not read, so missing products can't be told apart
+            self.result.errors.append(
+                'Products missing from the file were not unpublished, '
+                'because the import did not start at the first row'
+            )
+            return
+        retired = [
+            product for product in self.products.values()
+            if product.pk and product.live and product.pk not in self.seen_products
+        ]
+        self.result.retired_products = len(retired)
+        if self.dry_run or not retired:
+            return
+        with self.phase('retire'), transaction.atomic():
+            bulk_unpublish(retired, user=self.user)
+            products_imported.send(sender=type(self), categories=[], products=retired)
+
+    def run(self, source, start_row=0):
+        """Import rows from a file path, a django File or an iterable of row dicts (see open_rows)"""
+        try:
+            with open_rows(source) as rows:
+                return self.import_rows(rows, start_row=start_row)
+        except Exception as e:
+            # import_rows records its own failures; this catches bad headers or unreadable files
+            if self.started is None:
+                self.save_record(ProductImport.FAILED, error=str(e))
+            raise
+
+    def import_rows(self, rows, start_row=0):
+        """
+        Import an iterable of CSV row dicts (header is row 1, so rows start at 2).
+
+        The first start_row rows are skipped. Each chunk of rows is committed
+        in its own transaction; if one fails, the chunks before it stay saved,
+        the error is recorded and the exception is re-raised.
+        """
+        result = self.result
+        self.started = time.perf_counter()
+        result.rows_committed = start_row
+        rows = enumerate(islice(rows, start_row, None), start=start_row + 2)
+        try:
+            with self.phase('lookup'):
+                self.preload()
+            # Also the job's heartbeat, like the save after every chunk
+            self.save_record(ProductImport.RUNNING)
+            while True:
+                with self.phase('parse'):
+                    chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+            if self.unpublish_missing:
+                self.retire_missing(start_row)
+        except Exception as e:
+            self.save_record(ProductImport.FAILED, error=str(e))
+            raise
+        finally:
+            result.seconds = self.elapsed()
+        result.seconds_saved = self.estimate_seconds_saved()
+        self.save_record(ProductImport.COMPLETE)
+        return result
+
+    def import_chunk(self, chunk):
+        """Apply and write one chunk of (row_num, row) pairs in a single transaction"""
+        result = self.result
+        counts = result.counts()
+        try:
+            with transaction.atomic():
+                self.reset_chunk()
+                for row_num, row in chunk:
+                    result.rows += 1
+                    try:
+                        with self.phase('parse'):
+                            parsed = self.parse_row(row_num, row)
+                        if parsed is not None:
+                            with self.phase('lookup'):
+                                self.add_row(row_num, *parsed)
+                    except Exception as e:
+                        result.errors.append(f"Row {row_num}: {str(e)}")
+                if not self.dry_run:
+                    self.write()
+        except Exception:
+            # Only count what was committed
+            result.set_counts(counts)
+            raise
+        result.rows_committed += len(chunk)
+        self.save_record(ProductImport.RUNNING)
+
+    def save_record(self, status, error=''):
+        """Store progress, counts, timings and errors on the ProductImport record, if there is one"""
+        record = self.record
+        if record is None or self.dry_run:
+            return
+        result = self.result
+        record.status = status
+        record.error = error
+        record.rows_committed = result.rows_committed
+        record.rows_processed = result.rows
+        record.seconds = result.seconds or self.elapsed()
+        record.created_categories = result.created_categories
+        record.created_products = result.created_products
+        record.updated_products = result.updated_products
+        record.unchanged_products = result.unchanged_products
+        record.retired_products = result.retired_products
+        record.write_seconds = result.write_seconds
+        record.timings = {name: round(seconds, 3) for name, seconds in result.timings.items()}
+        record.seconds_saved = result.seconds_saved
+        record.errors = result.errors[:ProductImport.MAX_ERRORS]
+        record.error_count = len(result.errors)
+        record.save()
@@ -0,0 +1,38 @@
+"""
+Management command run by start.sh before gunicorn starts.
+
+Usage:
+    python manage.py boot
+    python manage.py boot --collectstatic --migrate
+
+Collects static files if the build didn't, applies pending migrations,
+creates the cache table and a superuser if needed, all in this one process,
+and prints how long each step took (see oden_site/boot.py). start.sh sets
+BOOT_STARTED so the report includes the time to start Python and Django.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from oden_site.boot import BootTimer, boot
+
+
+class Command(BaseCommand):
+    help = 'Prepare the database and static files for serving, timing each step'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collectstatic', action='store_true', help='Collect static files even if already collected')
+        parser.add_argument('--migrate', action='store_true', help='Run migrate even if no migrations are pending')
+
+    def handle(self, *args, **options):
+        started = os.environ.get('BOOT_STARTED')
+        timer = BootTimer(float(started) if started else None)
+        if started:
+            timer.record('django setup', time.time() - timer.started, 'Python and Django start-up')
+
+        boot(timer, collectstatic=options['collectstatic'], migrate=options['migrate'])
+
+        self.stdout.write('Boot phases:')
+        for line in timer.report():
+            self.stdout.write(f'  {line}')
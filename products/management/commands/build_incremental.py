@@ -0,0 +1,54 @@
+"""
+Management command to update the static site build with only what changed.
+
+Usage:
+    python manage.py build_incremental
+    python manage.py build_incremental --skip-static --skip-media
+    python manage.py build_incremental --all
+    python manage.py build_incremental --workers 4
+
+Takes the same options as wagtail-bakery's build command, but keeps the
+build directory and renders only pages published, moved or unpublished
+since the last run, plus their ancestors (see oden_site/static_build.py).
+"""
+import time
+
+from bakery.management.commands.build import Command as BuildCommand
+
+from oden_site.compression import format_compression
+from oden_site.static_build import build_incremental
+
+
+class Command(BuildCommand):
+    help = 'Incrementally bake published pages, rendering only the ones that changed'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Render every page (e.g. after a template change), still only writing changed files',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Render pages in this many processes (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.set_options(*args, **options)
+
+        if not options.get('skip_static'):
+            self.build_static()
+        if not options.get('skip_media'):
+            self.build_media()
+
+        counts = build_incremental(self.build_dir, rebuild_all=options['all'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {counts['rendered']} of {counts['total']} pages "
+            f"({counts['written']} written, {counts['unchanged']} unchanged), "
+            f"deleted {counts['deleted']} in {time.perf_counter() - start:.2f}s"
+        ))
+        self.stdout.write(format_compression(counts['compression']))
@@ -0,0 +1,96 @@
+"""
+Management command to rebuild the whole static site in parallel.
+
+Usage:
+    python manage.py build_parallel
+    python manage.py build_parallel --workers 8
+    python manage.py build_parallel --skip-static --skip-media --compare-serial
+
+Takes the same options as wagtail-bakery's build command. Every published
+page is rendered by a pool of worker processes into a new directory next to
+BUILD_DIR, which then replaces it, so a failed or interrupted build leaves
+the previous one in place. Per-page render times are written to
+.build-report.json in the build (see oden_site/static_build.py).
+"""
+import os
+import shutil
+import time
+
+from bakery.management.commands.build import Command as BuildCommand
+from django.conf import settings
+
+from oden_site.compression import format_compression
+from oden_site.static_build import MANIFEST_NAME, REPORT_NAME, build_pages, save_report, swap_build_dir
+
+
+class Command(BuildCommand):
+    help = 'Bake every published page with a pool of worker processes'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Number of worker processes (default: one per CPU)',
+        )
+        parser.add_argument(
+            '--compare-serial',
+            action='store_true',
+            help='Also time a serial build of the pages, to measure the speedup',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.set_options(*args, **options)
+
+        build_dir = self.build_dir.rstrip(os.sep)
+        new_dir = build_dir + '.new'
+        shutil.rmtree(new_dir, ignore_errors=True)
+        os.makedirs(new_dir)
+        # The last manifest holds the measured render time of each page type
+        if os.path.exists(os.path.join(build_dir, MANIFEST_NAME)):
+            shutil.copy(os.path.join(build_dir, MANIFEST_NAME), new_dir)
+        self.build_dir = settings.BUILD_DIR = new_dir
+
+        if not options.get('skip_static'):
+            self.build_static()
+        if not options.get('skip_media'):
+            self.build_media()
+
+        report = build_pages(new_dir, rebuild_all=True, workers=options['workers'])
+
+        if options['compare_serial']:
+            serial_dir = build_dir + '.serial'
+            shutil.rmtree(serial_dir, ignore_errors=True)
+            os.makedirs(serial_dir)
+            shutil.copy(os.path.join(new_dir, MANIFEST_NAME), serial_dir)
+            serial = build_pages(serial_dir, rebuild_all=True, workers=1)
+            shutil.rmtree(serial_dir)
+            report['serial_seconds'] = serial['seconds']
+            report['measured_speedup'] = round(serial['seconds'] / report['seconds'], 2)
+            save_report(new_dir, report)
+
+        settings.BUILD_DIR = build_dir
+        swap_build_dir(new_dir, build_dir)
+        self.build_dir = build_dir
+
+        for page_type, stats in report['types'].items():
+            self.stdout.write(
+                f"{page_type}: {stats['pages']} pages, {stats['seconds']:.2f}s, "
+                f"mean {stats['mean'] * 1000:.1f}ms, max {stats['max'] * 1000:.1f}ms"
+            )
+        self.stdout.write(
+            f"Rendering took {report['seconds']:.2f}s with {report['workers']} workers "
+            f"for {report['render_seconds']:.2f}s of render time ({report['speedup']}x)"
+        )
+        if options['compare_serial']:
+            self.stdout.write(
+                f"Serial build took {report['serial_seconds']:.2f}s: "
+                f"{report['measured_speedup']}x faster in parallel"
+            )
+        self.stdout.write(format_compression(report['compression']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {report['rendered']} pages into {build_dir} in {time.perf_counter() - start:.2f}s; "
+            f"per-page times are in {REPORT_NAME}"
+        ))
@@ -0,0 +1,32 @@
+"""
+Management command to write .br and .gz copies of the static build's pages.
+
+Usage:
+    python manage.py compress_build
+    python manage.py compress_build --workers 8
+
+build_incremental and build_parallel do this themselves; run it after
+wagtail-bakery's `manage.py build`. Only files written since they were last
+compressed are compressed again (see oden_site/compression.py).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from oden_site.compression import WORKERS, compress_build, format_compression
+
+
+class Command(BaseCommand):
+    help = 'Write Brotli and gzip copies of the HTML and JSON files in BUILD_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--build-dir', default=None, help='Build directory (default: BUILD_DIR)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=WORKERS,
+            help=f'Files compressed at once (default: {WORKERS})',
+        )
+
+    def handle(self, *args, **options):
+        counts = compress_build(options['build_dir'] or settings.BUILD_DIR, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(format_compression(counts)))
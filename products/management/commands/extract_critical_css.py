@@ -0,0 +1,53 @@
+"""
+Management command to extract the critical CSS of each page type.
+
+Usage:
+    python manage.py extract_critical_css
+
+Renders the first live page of each type in CRITICAL_PAGE_TYPES and writes
+the rules of main.css it needs above the fold to
+static/css/critical/<name>.css (see oden_site/critical_css.py). Rerun it
+after changing main.css or the page templates, and commit the results.
+"""
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from oden_site.critical_css import (
+    CRITICAL_PAGE_TYPES,
+    extract_critical_css,
+    get_critical_css,
+    get_critical_path,
+    get_stylesheet,
+)
+
+
+class Command(BaseCommand):
+    help = 'Write the above-the-fold CSS of each page type to static/css/critical/'
+
+    def handle(self, *args, **options):
+        stylesheet = get_stylesheet()
+        client = Client()
+        with override_settings(CRITICAL_CSS=False, PAGE_CACHE_PAGE_TYPES=[]):
+            for label, name in CRITICAL_PAGE_TYPES.items():
+                page = apps.get_model(label).objects.live().order_by('path').first()
+                if page is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: no live {label}, skipped'))
+                    continue
+                response = client.get(page.url, SERVER_NAME=page.get_site().hostname)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.WARNING(f'{name}: {page.url} returned {response.status_code}, skipped'))
+                    continue
+
+                css = extract_critical_css(stylesheet, response.content.decode())
+                path = get_critical_path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(css + '\n')
+                self.stdout.write(f'{name}: {len(css) / 1024:.1f}KB from {page.url}')
+
+        get_critical_css.cache_clear()
+        self.stdout.write(self.style.SUCCESS(f'Main stylesheet: {len(stylesheet.encode()) / 1024:.1f}KB'))
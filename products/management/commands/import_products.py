@@ -3,14 +3,19 @@ Management command to import products from CSV file.
 
 Usage:
     python manage.py import_products products.csv
+    python manage.py import_products products.csv --chunk-size 5000
+    python manage.py import_products products.csv --resume
+    python manage.py import_products products.csv --unpublish-missing
+
+Products that are already live at the same price are left alone, so
+re-importing the same file writes nothing.
 """
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
-import csv
 import os
-from decimal import Decimal, InvalidOperation
-from products.models import ProductsListingPage, ProductIndexPage, ProductPage
-from wagtail.models import Page
+from products.importer import (
+    CHUNK_SIZE, ProductImporter, ProductImportError, get_or_create_products_listing, start_import,
+)
+from products.models import ProductsListingPage
 
 
 class Command(BaseCommand):
@@ -23,140 +28,106 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be imported without actually importing',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows to commit per transaction (default: {CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--start-row',
+            type=int,
+            default=0,
+            help='Skip this many data rows before importing',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue from the row where the last failed import of this file stopped',
+        )
+        parser.add_argument(
+            '--unpublish-missing',
+            action='store_true',
+            help='Unpublish live products that are not in the file',
+        )
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
         dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
 
         if not os.path.exists(csv_file_path):
             raise CommandError(f'CSV file not found: {csv_file_path}')
 
         # Get or create Products Listing Page (must be under HomePage)
-        products_listing = ProductsListingPage.objects.live().first()
-        if not products_listing:
-            from home.models import HomePage
-            home_page = HomePage.objects.live().first()
-            if not home_page:
-                raise CommandError('Home Page must be created first. Please create a Home Page before importing products.')
-            
-            products_listing = ProductsListingPage(
-                title="Products",
-                slug="products"
-            )
-            home_page.add_child(instance=products_listing)
-            products_listing.save_revision().publish()
+        listing_exists = ProductsListingPage.objects.live().exists()
+        try:
+            products_listing = get_or_create_products_listing()
+        except ProductImportError as e:
+            raise CommandError(str(e))
+        if not listing_exists:
             self.stdout.write(self.style.SUCCESS(f'Created Products Listing Page'))
 
-        created_categories = 0
-        created_products = 0
-        updated_products = 0
-        errors = []
+        importer = ProductImporter(
+            products_listing,
+            dry_run=dry_run,
+            chunk_size=chunk_size,
+            unpublish_missing=options['unpublish_missing'],
+        )
+        start_row = options['start_row']
+        if not dry_run:
+            importer.record = start_import(
+                os.path.basename(csv_file_path),
+                start_row=start_row,
+                resume=options['resume'],
+                unpublish_missing=options['unpublish_missing'],
+            )
+            start_row = importer.record.rows_committed
+        if start_row:
+            self.stdout.write(f'Starting at row {start_row + 2}')
 
         try:
-            with open(csv_file_path, 'r', encoding='utf-8') as f:
-                csv_reader = csv.DictReader(f)
-                
-                # Validate headers
-                required_headers = {'product_category', 'product', 'price'}
-                if not required_headers.issubset(csv_reader.fieldnames or []):
-                    raise CommandError(
-                        f'CSV must have columns: product_category, product, price. '
-                        f'Found: {", ".join(csv_reader.fieldnames or [])}'
-                    )
-
-                with transaction.atomic():
-                    for row_num, row in enumerate(csv_reader, start=2):
-                        try:
-                            category_name = row.get('product_category', '').strip()
-                            product_name = row.get('product', '').strip()
-                            price_str = row.get('price', '').strip()
-
-                            if not category_name or not product_name or not price_str:
-                                errors.append(f"Row {row_num}: Missing required field")
-                                continue
-
-                            # Parse price
-                            try:
-                                price = Decimal(price_str)
-                            except (InvalidOperation, ValueError):
-                                errors.append(f"Row {row_num}: Invalid price '{price_str}'")
-                                continue
-
-                            if dry_run:
-                                self.stdout.write(
-                                    f"Would import: {product_name} ({category_name}) - ${price}"
-                                )
-                                continue
-
-                            # Get or create category
-                            category = ProductIndexPage.objects.filter(
-                                title=category_name,
-                                path__startswith=products_listing.path
-                            ).first()
-
-                            if not category:
-                                category = ProductIndexPage(
-                                    title=category_name,
-                                    slug=category_name.lower().replace(' ', '-').replace('/', '-')
-                                )
-                                products_listing.add_child(instance=category)
-                                category.save_revision().publish()
-                                created_categories += 1
-                                self.stdout.write(
-                                    self.style.SUCCESS(f'Created category: {category_name}')
-                                )
-
-                            # Check if product already exists
-                            existing_product = ProductPage.objects.filter(
-                                title=product_name,
-                                path__startswith=category.path
-                            ).first()
-
-                            if existing_product:
-                                existing_product.price = price
-                                existing_product.save_revision().publish()
-                                updated_products += 1
-                                self.stdout.write(
-                                    self.style.WARNING(f'Updated: {product_name}')
-                                )
-                            else:
-                                # Create new product
-                                product = ProductPage(
-                                    title=product_name,
-                                    slug=product_name.lower().replace(' ', '-').replace('/', '-'),
-                                    price=price,
-                                    description=f"Product: {product_name}"
-                                )
-                                category.add_child(instance=product)
-                                product.save_revision().publish()
-                                created_products += 1
-                                self.stdout.write(
-                                    self.style.SUCCESS(f'Created: {product_name}')
-                                )
-
-                        except Exception as e:
-                            errors.append(f"Row {row_num}: {str(e)}")
-                            self.stdout.write(
-                                self.style.ERROR(f'Error on row {row_num}: {str(e)}')
-                            )
-
+            result = importer.run(csv_file_path, start_row=start_row)
         except Exception as e:
+            rows_committed = importer.result.rows_committed
+            if rows_committed:
+                self.stderr.write(
+                    f'The first {rows_committed} rows were saved. '
+                    f'Run again with --resume to continue from row {rows_committed + 2}.'
+                )
             raise CommandError(f'Error reading CSV file: {str(e)}')
 
         # Summary
         self.stdout.write('\n' + '=' * 60)
         if dry_run:
-            self.stdout.write(self.style.WARNING('DRY RUN - No changes made'))
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN - No changes made. Would create {result.created_categories} categories, '
+                f'{result.created_products} products, update {result.updated_products} products, '
+                f'retire {result.retired_products} products'
+            ))
         else:
             self.stdout.write(self.style.SUCCESS(
-                f'Import complete! Created {created_categories} categories, '
-                f'{created_products} products, updated {updated_products} products'
+                f'Import complete! Created {result.created_categories} categories, '
+                f'{result.created_products} products, updated {result.updated_products} products, '
+                f'retired {result.retired_products} products'
             ))
-        
+        self.stdout.write(f'Unchanged: {result.unchanged_products} products')
+        self.stdout.write(
+            f'Processed {result.rows} rows in {result.seconds:.2f}s '
+            f'({result.rows_per_second:.0f} rows/sec)'
+        )
+        self.stdout.write('Timings: ' + ', '.join(
+            f'{phase} {seconds:.2f}s' for phase, seconds in result.timings.items()
+        ))
+        if result.unchanged_products and result.seconds_saved is not None:
+            self.stdout.write(f'Skipping unchanged products saved about {result.seconds_saved:.2f}s')
+
+        errors = result.errors
         if errors:
             self.stdout.write(self.style.ERROR(f'\nErrors: {len(errors)}'))
             for error in errors[:10]:
                 self.stdout.write(self.style.ERROR(f'  - {error}'))
             if len(errors) > 10:
                 self.stdout.write(self.style.ERROR(f'  ... and {len(errors) - 10} more errors'))
-
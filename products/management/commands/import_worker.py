@@ -0,0 +1,65 @@
+"""
+Management command that runs CSV product imports queued from the admin.
+
+The stored uploads of imports that failed more than
+ProductImport.UPLOAD_RETENTION ago are deleted once an hour.
+
+Usage:
+    python manage.py import_worker
+    python manage.py import_worker --once
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django.utils import timezone
+
+from products.importer import claim_next_import, delete_old_uploads, run_import
+
+
+class Command(BaseCommand):
+    help = 'Run queued product imports, polling the database for new ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the imports that are queued now, then exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)',
+        )
+
+    # How often the uploads of old failed imports are deleted
+    CLEANUP_INTERVAL = timedelta(hours=1)
+
+    def handle(self, *args, **options):
+        next_cleanup = timezone.now()
+        while True:
+            close_old_connections()
+            if timezone.now() >= next_cleanup:
+                deleted = delete_old_uploads()
+                if deleted:
+                    self.stdout.write(f'Deleted the uploads of {deleted} old failed imports')
+                next_cleanup = timezone.now() + self.CLEANUP_INTERVAL
+            record = claim_next_import()
+            if record is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Importing {record.file_name} (job {record.pk})')
+            run_import(record)
+            if record.status == record.COMPLETE:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Job {record.pk} complete: {record.rows_processed} rows in {record.seconds:.2f}s '
+                    f'({record.rows_per_second:.0f} rows/sec)'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'Job {record.pk} failed: {record.error}'))
@@ -0,0 +1,44 @@
+"""
+Management command to inspect or clear the rendered page cache.
+
+Usage:
+    python manage.py page_cache
+    python manage.py page_cache --clear
+    python manage.py page_cache --reset-stats
+
+With PAGE_CACHE_BACKEND=locmem each process has its own cache and
+counters, so this only reports on the 'db' and 'file' backends.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from oden_site.page_cache import clear_page_cache, get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show page cache hit/miss counters, or clear the page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete every cached page')
+        parser.add_argument('--reset-stats', action='store_true', help='Reset the hit/miss counters')
+        parser.add_argument('--json', action='store_true', help='Print the counters as JSON')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_page_cache()
+            self.stdout.write(self.style.SUCCESS('Page cache cleared'))
+        if options['reset_stats']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Page cache counters reset'))
+
+        stats = get_stats()
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+        self.stdout.write(
+            f"Backend: {stats['backend']}\n"
+            f"Hits: {stats['hits']}\n"
+            f"Misses: {stats['misses']}\n"
+            f"Hit ratio: {stats['hit_ratio']:.1%}"
+        )
@@ -0,0 +1,42 @@
+"""
+Management command to generate the image renditions used by the templates.
+
+Usage:
+    python manage.py warm_renditions
+    python manage.py warm_renditions --workers 16
+
+Only renditions that don't exist yet are created, so the command can be
+stopped and run again, e.g. after every import or deploy (see
+products/renditions.py).
+"""
+from django.core.management.base import BaseCommand
+
+from products.renditions import WORKERS, get_image_specs, warm_renditions
+
+
+class Command(BaseCommand):
+    help = 'Pre-generate the renditions of every image shown on the site'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=WORKERS,
+            help=f'Number of threads generating renditions (default: {WORKERS})',
+        )
+
+    def handle(self, *args, **options):
+        image_specs = get_image_specs()
+        renditions = sum(len(specs) for specs in image_specs.values())
+        self.stdout.write(f'{len(image_specs)} images in use, {renditions} renditions needed')
+
+        counts = warm_renditions(image_specs, workers=options['workers'])
+        rate = counts['generated'] / counts['seconds'] if counts['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['generated']} renditions in {counts['seconds']:.2f}s "
+            f"({rate:.1f}/s), {renditions - counts['generated'] - counts['failed']} already existed"
+        ))
+        if counts['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"{counts['failed']} renditions failed, see the log; run the command again to retry"
+            ))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_productindexpage_cover_photo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(help_text='Name of the imported CSV file', max_length=255)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('failed', 'Failed'), ('complete', 'Complete')], default='running', max_length=20)),
+                ('rows_committed', models.PositiveIntegerField(default=0, help_text='Number of data rows already saved; a resumed import skips this many rows')),
+                ('error', models.TextField(blank=True, help_text='Error that stopped the import')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Product Import',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
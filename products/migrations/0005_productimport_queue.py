@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0004_productimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimport',
+            name='created_categories',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='created_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='csv_file',
+            field=models.FileField(blank=True, help_text='Uploaded CSV waiting to be imported by the worker', storage=products.models.product_import_storage, upload_to='%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='error_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='errors',
+            field=models.JSONField(blank=True, default=list, help_text='Row errors (first MAX_ERRORS only)'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='rows_processed',
+            field=models.PositiveIntegerField(default=0, help_text='Rows read by the current run'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='seconds',
+            field=models.FloatField(default=0, help_text='Duration of the current run'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='updated_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='productimport',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed'), ('complete', 'Complete')], default='running', max_length=20),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_productimport_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimport',
+            name='retired_products',
+            field=models.PositiveIntegerField(default=0, help_text='Products unpublished as missing from the file'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='seconds_saved',
+            field=models.FloatField(blank=True, help_text='Estimated time saved by skipping unchanged products', null=True),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='unchanged_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='unpublish_missing',
+            field=models.BooleanField(default=False, help_text='Unpublish live products that are not in the file'),
+        ),
+        migrations.AddField(
+            model_name='productimport',
+            name='write_seconds',
+            field=models.FloatField(default=0, help_text='Time spent writing and publishing pages'),
+        ),
+    ]
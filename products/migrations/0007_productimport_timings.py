@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productimport_diff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimport',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Seconds spent in each import phase'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+from wagtail.rich_text import get_text_for_indexing
+
+# Length of each step of a treebeard path in Wagtail's page tree
+STEPLEN = 4
+
+
+def fill_catalog_fields(apps, schema_editor):
+    """Set category and description_text of the existing products"""
+    ProductIndexPage = apps.get_model('products', 'ProductIndexPage')
+    ProductPage = apps.get_model('products', 'ProductPage')
+
+    categories = dict(ProductIndexPage.objects.values_list('path', 'pk'))
+    products = list(ProductPage.objects.only('path', 'description'))
+    for product in products:
+        product.category_id = categories.get(product.path[:-STEPLEN])
+        product.description_text = get_text_for_indexing(product.description or '')
+    ProductPage.objects.bulk_update(products, ['category', 'description_text'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    # Squashes the separate sort index and catalog field migrations, so
+    # databases that applied those are treated as up to date
+    replaces = [
+        ('products', '0008_productpage_sort_indexes'),
+        ('products', '0009_productpage_category_description_text'),
+    ]
+
+    dependencies = [
+        ('products', '0007_productimport_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productpage',
+            name='category',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Parent category page', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='products.productindexpage'),
+        ),
+        migrations.AddField(
+            model_name='productpage',
+            name='description_text',
+            field=models.TextField(blank=True, editable=False, help_text='Product description as plain text'),
+        ),
+        migrations.AddIndex(
+            model_name='productpage',
+            index=models.Index(fields=['category', 'price', 'page_ptr'], name='productpage_category_price_idx'),
+        ),
+        migrations.RunPython(fill_catalog_fields, migrations.RunPython.noop),
+        # The other category page sorts are on Wagtail's page table, which
+        # this app can't declare indexes for
+        migrations.RunSQL(
+            'CREATE INDEX page_first_published_id_idx ON wagtailcore_page (first_published_at, id)',
+            reverse_sql='DROP INDEX page_first_published_id_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX page_title_id_idx ON wagtailcore_page (title, id)',
+            reverse_sql='DROP INDEX page_title_id_idx',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+from products.text import plain_text, summarise
+
+
+def fill_description_text(apps, schema_editor):
+    """Store the normalised plain text and summary of the existing descriptions"""
+    ProductPage = apps.get_model('products', 'ProductPage')
+
+    products = list(ProductPage.objects.only('description'))
+    for product in products:
+        product.description_text = plain_text(product.description)
+        product.description_summary = summarise(product.description_text)
+    ProductPage.objects.bulk_update(products, ['description_text', 'description_summary'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0010_productpage_description_summary to close the gap left by the squash
+    replaces = [('products', '0010_productpage_description_summary')]
+
+    dependencies = [
+        ('products', '0008_productpage_category_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productpage',
+            name='description_summary',
+            field=models.CharField(blank=True, editable=False, help_text='Start of the plain text description', max_length=160),
+        ),
+        migrations.RunPython(fill_description_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0011_productimport_superseded to close the gap left by the squash
+    replaces = [('products', '0011_productimport_superseded')]
+
+    dependencies = [
+        ('products', '0009_productpage_description_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimport',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed'), ('superseded', 'Superseded'), ('complete', 'Complete')], default='running', max_length=20),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:45
+
+from django.db import migrations, models
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0012_productimport_media_storage to close the gap left by the squash
+    replaces = [('products', '0012_productimport_media_storage')]
+
+    dependencies = [
+        ('products', '0010_productimport_superseded'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimport',
+            name='csv_file',
+            field=models.FileField(blank=True, help_text='Uploaded CSV waiting to be imported by the worker', storage=products.models.product_import_storage, upload_to='product_imports/%Y/%m/'),
+        ),
+    ]
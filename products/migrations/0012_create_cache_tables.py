@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    """Create the tables of the database caches in CACHES, if any"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_productimport_media_storage'),
+    ]
+
+    operations = [
+        # The page and search caches are on the database by default (see
+        # CACHES in settings.py), so a plain `migrate` creates their tables
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:20
+
+from django.db import migrations, models
+
+
+def move_uploads_to_database(apps, schema_editor):
+    """Copy the stored files of unfinished and failed imports into csv_data and delete every stored file"""
+    ProductImport = apps.get_model('products', 'ProductImport')
+    for record in ProductImport.objects.using(schema_editor.connection.alias).exclude(csv_file=''):
+        if record.status in ('queued', 'running', 'failed'):
+            try:
+                with record.csv_file.open('rb') as f:
+                    record.csv_data = f.read()
+            except OSError:
+                pass
+        record.csv_file.delete(save=False)
+        record.save(update_fields=['csv_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_create_cache_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimport',
+            name='csv_data',
+            field=models.BinaryField(blank=True, help_text='Uploaded CSV waiting to be imported by the worker', null=True),
+        ),
+        migrations.RunPython(move_uploads_to_database, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='productimport',
+            name='csv_file',
+        ),
+    ]
@@ -1,10 +1,20 @@
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from wagtail.models import Page
 from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel
 from wagtail.search import index
 
+from .pagination import keyset_paginate
+from .renditions import prefetch_renditions
+from .text import SUMMARY_LENGTH, plain_text, summarise
+
 
 class ProductsListingPage(Page):
     """Main products page that lists all product categories - Only one instance allowed"""
@@ -27,44 +37,13 @@ class ProductsListingPage(Page):
         categories = ProductIndexPage.objects.live().public().filter(
             path__startswith=self.path
         ).order_by('title')
-        context['categories'] = categories
-        
-        # Get all products for search functionality
-        all_products = ProductPage.objects.live().public().filter(
-            path__startswith=self.path
-        ).select_related('image').order_by('title')
-        
-        # Prepare product data for JavaScript
-        import json
-        from django.utils.html import strip_tags
-        
-        products_data = []
-        for product in all_products:
-            # Extract plain text from RichTextField
-            description_text = ''
-            if product.description:
-                if hasattr(product.description, 'source'):
-                    # It's a RichText object
-                    description_text = strip_tags(str(product.description))
-                elif hasattr(product.description, 'plain_text'):
-                    # It has plain_text method
-                    description_text = product.description.plain_text()
-                else:
-                    # It's already a string or can be converted
-                    description_text = strip_tags(str(product.description))
-            
-            products_data.append({
-                'id': product.id,
-                'title': product.title,
-                'price': str(product.price),
-                'description': description_text,
-                'sku': product.sku or '',
-                'url': product.url,
-                'category': product.get_parent().title if product.get_parent() else '',
-                'image_url': product.image.file.url if product.image and product.image.file else '',
-            })
-        
-        context['all_products_json'] = json.dumps(products_data)
+        context['categories'] = prefetch_renditions(categories, 'cover_photo', 'card')
+
+        # Static builds can't run the search endpoint, so they search the
+        # baked search index in the browser instead
+        if getattr(request, 'is_static_build', False):
+            from .search_index import get_search_index_url
+            context['search_index_url'] = get_search_index_url(request)
         return context
     
     def clean(self):
@@ -109,13 +88,56 @@ class ProductIndexPage(Page):
         FieldPanel('intro'),
     ]
     
+    # "Load more" requests (sent with X-Requested-With) get just the next cards
+    ajax_template = 'products/product_cards.html'
+
+    PRODUCTS_PER_PAGE = 24
+
+    # Product orderings offered on the page: ?sort=<key> -> (label, ordering).
+    # Each ends with the id for keyset pagination and has a matching index.
+    PRODUCT_SORTS = {
+        'newest': ('Newest', ('-first_published_at', '-id')),
+        'price': ('Price: low to high', ('price', 'id')),
+        '-price': ('Price: high to low', ('-price', '-id')),
+        'title': ('Name', ('title', 'id')),
+    }
+    DEFAULT_SORT = 'newest'
+    
     def get_context(self, request):
         context = super().get_context(request)
-        # Only show products that are direct children of this category
-        products = ProductPage.objects.live().public().filter(
-            path__startswith=self.path
-        ).order_by('-first_published_at')
-        context['products'] = products
+        sort = request.GET.get('sort')
+        if sort not in self.PRODUCT_SORTS:
+            sort = self.DEFAULT_SORT
+
+        # Only show products that are direct children of this category, a
+        # page at a time after the ?after= cursor. Static builds can't serve
+        # query strings, so they get every product on one page.
+        static_build = getattr(request, 'is_static_build', False)
+        products = ProductPage.objects.live().public().filter(category=self)
+        products_page = keyset_paginate(
+            prefetch_renditions(products, 'image', 'card'),
+            self.PRODUCT_SORTS[sort][1],
+            request.GET.get('after'),
+            None if static_build else self.PRODUCTS_PER_PAGE,
+        )
+
+        params = {} if sort == self.DEFAULT_SORT else {'sort': sort}
+        context.update({
+            'products': products_page.object_list,
+            'products_page': products_page,
+            # Cards after the first page are all below the fold
+            'card_offset': self.PRODUCTS_PER_PAGE if request.GET.get('after') else 0,
+            'next_url': (
+                '?' + urlencode({**params, 'after': products_page.next_cursor})
+                if products_page.has_next else None
+            ),
+            'static_build': static_build,
+            'sort': sort,
+            'sorts': [
+                (key, label, '?' + urlencode({'sort': key}) if key != self.DEFAULT_SORT else '?')
+                for key, (label, ordering) in self.PRODUCT_SORTS.items()
+            ],
+        })
         return context
     
     class Meta:
@@ -144,6 +166,27 @@ class ProductPage(Page):
         related_name='+',
         help_text="Product specification PDF"
     )
+
+    # Denormalised for the catalog queries and kept up to date by signals.py:
+    # the parent category, so products can be filtered by category without a
+    # path prefix scan, and the description as plain text for search, result
+    # lists and page metadata
+    category = models.ForeignKey(
+        'products.ProductIndexPage',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='products',
+        help_text="Parent category page"
+    )
+    description_text = models.TextField(blank=True, editable=False, help_text="Product description as plain text")
+    description_summary = models.CharField(
+        max_length=SUMMARY_LENGTH,
+        blank=True,
+        editable=False,
+        help_text="Start of the plain text description"
+    )
     
     # ProductPage can only be a child of ProductIndexPage
     parent_page_types = ['products.ProductIndexPage']
@@ -152,8 +195,9 @@ class ProductPage(Page):
     subpage_types = []
     
     search_fields = Page.search_fields + [
-        index.SearchField('description'),
+        index.SearchField('description_text'),
         index.SearchField('sku'),
+        index.FilterField('category'),
     ]
     
     content_panels = Page.content_panels + [
@@ -163,9 +207,144 @@ class ProductPage(Page):
         FieldPanel('image'),
         FieldPanel('specification_pdf'),
     ]
-    
+
+    def update_catalog_fields(self, category=None):
+        """Set category (looked up from the page tree unless given) and the plain text description"""
+        if category is not None:
+            self.category = category
+        elif self.path:
+            self.category_id = ProductIndexPage.objects.filter(
+                path=self.path[:-self.steplen]
+            ).values_list('pk', flat=True).first()
+        self.description_text = plain_text(self.description)
+        self.description_summary = summarise(self.description_text)
     
     class Meta:
         verbose_name = "Product Page"
         verbose_name_plural = "Product Pages"
+        indexes = [
+            # Category pages sorted by price (see ProductIndexPage.PRODUCT_SORTS)
+            models.Index(fields=['category', 'price', 'page_ptr'], name='productpage_category_price_idx'),
+        ]
+
+
+
+def product_import_storage():
+    """
+    Storage of the csv_file field that queued CSV uploads used to be kept
+    in; only referenced by migrations now that they are stored in csv_data
+    """
+    if settings.STORAGES['default']['BACKEND'].startswith('cloudinary_storage.'):
+        from cloudinary_storage.storage import RawMediaCloudinaryStorage
+        return RawMediaCloudinaryStorage()
+    return default_storage
+
+
+class ProductImport(models.Model):
+    """
+    A CSV product import job.
+
+    Imports from the admin are queued here and run by the import_worker
+    management command. Progress is recorded by row offset, so a failed
+    import can be resumed from where it stopped.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    # A failed import that a later import of the same file resumed
+    SUPERSEDED = 'superseded'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+        (SUPERSEDED, 'Superseded'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    # Only the first errors are kept, a bad file can have one per row
+    MAX_ERRORS = 100
+
+    # Running imports save the record after every chunk, which updates
+    # updated_at. One not saved for this long was stopped by a restart.
+    STALE_AFTER = timedelta(minutes=10)
+
+    # Uploads of failed imports are kept this long so they can be retried
+    UPLOAD_RETENTION = timedelta(days=7)
+
+    file_name = models.CharField(max_length=255, help_text="Name of the imported CSV file")
+    # Kept in the database rather than the media storage, which may be
+    # publicly served (Cloudinary), and shared by the web and worker processes
+    csv_data = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Uploaded CSV waiting to be imported by the worker"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    rows_committed = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of data rows already saved; a resumed import skips this many rows"
+    )
+    rows_processed = models.PositiveIntegerField(default=0, help_text="Rows read by the current run")
+    seconds = models.FloatField(default=0, help_text="Duration of the current run")
+    created_categories = models.PositiveIntegerField(default=0)
+    created_products = models.PositiveIntegerField(default=0)
+    updated_products = models.PositiveIntegerField(default=0)
+    unchanged_products = models.PositiveIntegerField(default=0)
+    retired_products = models.PositiveIntegerField(default=0, help_text="Products unpublished as missing from the file")
+    unpublish_missing = models.BooleanField(
+        default=False,
+        help_text="Unpublish live products that are not in the file"
+    )
+    write_seconds = models.FloatField(default=0, help_text="Time spent writing and publishing pages")
+    timings = models.JSONField(default=dict, blank=True, help_text="Seconds spent in each import phase")
+    seconds_saved = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Estimated time saved by skipping unchanged products"
+    )
+    errors = models.JSONField(default=list, blank=True, help_text="Row errors (first MAX_ERRORS only)")
+    error_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, help_text="Error that stopped the import")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Product Import"
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()}, {self.rows_committed} rows)"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.FAILED, self.SUPERSEDED, self.COMPLETE)
+
+    @property
+    def is_stale(self):
+        return self.status == self.RUNNING and self.updated_at < timezone.now() - self.STALE_AFTER
+
+    @property
+    def has_upload(self):
+        """Whether the uploaded CSV is still stored, without loading it if it was deferred"""
+        if 'csv_data' in self.get_deferred_fields():
+            return ProductImport.objects.filter(pk=self.pk, csv_data__isnull=False).exists()
+        return self.csv_data is not None
+
+    @property
+    def can_retry(self):
+        """Whether the stored upload can be imported again from where the job stopped"""
+        return self.has_upload and (self.status == self.FAILED or self.is_stale)
 
+    @property
+    def rows_per_second(self):
+        return self.rows_processed / self.seconds if self.seconds else 0.0
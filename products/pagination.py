@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET pagination makes the database walk past every earlier row, so deep
+pages of a large category get slower and slower. Keyset pagination instead
+remembers the sort values of the last row shown and asks for the rows after
+it, which an index on the sort columns answers directly however deep the
+page is. The cursor is those values, base64 encoded for the URL.
+
+Orderings must end with a unique field (the id) so the position is exact.
+"""
+import binascii
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str | None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(values):
+    """Cursor for a row's sort values; datetimes keep their microseconds"""
+    def to_json(value):
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    data = json.dumps([to_json(value) for value in values], separators=(',', ':'))
+    return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    """Sort values from a cursor, or None if it is missing or not valid for ordering"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            return None
+        # encode_cursor only writes strings and numbers; null would compare as NULL
+        if any(isinstance(value, bool) or not isinstance(value, (str, int, float)) for value in values):
+            return None
+        return [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, ValidationError, FieldDoesNotExist):
+        return None
+
+
+def after(ordering, values):
+    """Q for the rows that come after values in ordering"""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor, per_page):
+    """
+    Return the KeysetPage of queryset after cursor (the first page if it is
+    empty or invalid), ordered by ordering. per_page=None returns every row.
+
+    One extra row is fetched to tell whether there is a next page.
+    """
+    values = decode_cursor(queryset.model, ordering, cursor)
+    if values is not None:
+        queryset = queryset.filter(after(ordering, values))
+    queryset = queryset.order_by(*ordering)
+    if per_page is None:
+        return KeysetPage(list(queryset), None)
+    rows = list(queryset[:per_page + 1])
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], name.lstrip('-')) for name in ordering])
+    return KeysetPage(rows, next_cursor)
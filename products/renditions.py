@@ -0,0 +1,229 @@
+"""
+Pre-generating the image renditions used by the site's templates.
+
+Wagtail creates a rendition the first time a template asks for it, so the
+first visitor after an upload or import waits for every image on the page
+to be resized (and uploaded to Cloudinary when it is configured).
+warm_renditions() creates them ahead of time with a thread pool. Only
+missing renditions are generated, so it can be interrupted and run again.
+
+It is run by the warm_renditions command and, in the background, when an
+image is saved or a page using images is published (see signals.py).
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models import Prefetch
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter
+
+logger = logging.getLogger(__name__)
+
+# Responsive image sets used by the templates (see the responsive_image and
+# background_image_set tags in templatetags/responsive_images.py). Each is
+# rendered at every one of its sizes in every format, and 'sizes' tells the
+# browser how wide the image is shown so it can pick from the srcset.
+# Pillow encodes AVIF itself from 11.2.1 on (see requirements.txt).
+IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+IMAGE_SETS = {
+    # Product and category cards: one column on phones
+    'card': {
+        'specs': ('fill-400x300', 'fill-800x600'),
+        'sizes': '(max-width: 768px) 100vw, 400px',
+        # Cards after the first row are lazy loaded
+        'eager': 3,
+    },
+    # Product page: half the container on desktop
+    'detail': {
+        'specs': ('width-400', 'width-800', 'width-1200'),
+        'sizes': '(max-width: 768px) 100vw, 600px',
+        'eager': 1,
+    },
+    # StreamField image blocks
+    'content': {
+        'specs': ('width-600', 'width-1200'),
+        'sizes': '(max-width: 1200px) 100vw, 1200px',
+        'eager': 0,
+    },
+    # Hero and category backgrounds, chosen by viewport width with @media
+    'hero': {
+        'specs': ('width-800', 'width-1280', 'width-1920'),
+    },
+}
+
+# Image sets each image field is shown with, as in the templates
+FIELD_IMAGE_SETS = {
+    ('products', 'ProductPage', 'image'): ('card', 'detail'),
+    ('products', 'ProductIndexPage', 'cover_photo'): ('card', 'hero'),
+    ('home', 'HomePage', 'hero_background'): ('hero',),
+}
+
+# StreamField image blocks
+STREAM_FIELDS = (
+    ('home', 'HomePage', 'body'),
+    ('home', 'AboutPage', 'body'),
+)
+STREAM_IMAGE_SETS = ('content',)
+
+
+def get_set_specs(name):
+    """Filter specs of every size and format of an image set, grouped by format"""
+    return [
+        f'{spec}|format-{image_format}'
+        for image_format in IMAGE_FORMATS
+        for spec in IMAGE_SETS[name]['specs']
+    ]
+
+
+def get_specs(names):
+    """Filter specs of all the given image sets"""
+    return {spec for name in names for spec in get_set_specs(name)}
+
+
+def prefetch_renditions(queryset, field_name, *names):
+    """
+    Prefetch the image in field_name of each object in queryset, with its
+    renditions for the given image sets.
+
+    This takes two queries however many objects there are, and the
+    responsive image tags then find the renditions without querying.
+    """
+    return queryset.prefetch_related(Prefetch(
+        field_name,
+        queryset=get_image_model().objects.prefetch_renditions(*get_specs(names)),
+    ))
+
+
+WORKERS = 8
+
+# Images loaded from the database at once
+BATCH_SIZE = 200
+
+
+def get_image_specs(image_ids=None):
+    """
+    Return {image id: set of rendition specs} for every image the site shows.
+
+    If image_ids is given, only those images are looked up.
+    """
+    specs = defaultdict(set)
+    for (app_label, model_name, field_name), names in FIELD_IMAGE_SETS.items():
+        field_specs = get_specs(names)
+        queryset = apps.get_model(app_label, model_name).objects.filter(**{f'{field_name}__isnull': False})
+        if image_ids is not None:
+            queryset = queryset.filter(**{f'{field_name}__in': image_ids})
+        for image_id in queryset.values_list(field_name, flat=True).distinct():
+            specs[image_id].update(field_specs)
+
+    for app_label, model_name, field_name in STREAM_FIELDS:
+        for page in apps.get_model(app_label, model_name).objects.only(field_name):
+            for block in getattr(page, field_name).raw_data:
+                if block['type'] == 'image' and block['value']:
+                    if image_ids is None or block['value'] in image_ids:
+                        specs[block['value']].update(get_specs(STREAM_IMAGE_SETS))
+    return specs
+
+
+def get_page_image_specs(page):
+    """Return {image id: set of rendition specs} for the images on one page"""
+    page = page.specific
+    specs = defaultdict(set)
+    for (app_label, model_name, field_name), names in FIELD_IMAGE_SETS.items():
+        if page._meta.label == f'{app_label}.{model_name}':
+            image_id = getattr(page, f'{field_name}_id')
+            if image_id:
+                specs[image_id].update(get_specs(names))
+    for app_label, model_name, field_name in STREAM_FIELDS:
+        if page._meta.label == f'{app_label}.{model_name}':
+            for block in getattr(page, field_name).raw_data:
+                if block['type'] == 'image' and block['value']:
+                    specs[block['value']].update(get_specs(STREAM_IMAGE_SETS))
+    return specs
+
+
+def find_missing(image_specs):
+    """
+    Yield lists of (image, missing filters) for images lacking any of their
+    renditions, a batch of images at a time.
+
+    Existing renditions are prefetched with each batch, so this does two
+    queries per BATCH_SIZE images.
+    """
+    all_specs = {spec for specs in image_specs.values() for spec in specs}
+    image_ids = sorted(image_specs)
+    for start in range(0, len(image_ids), BATCH_SIZE):
+        images = get_image_model().objects.filter(
+            pk__in=image_ids[start:start + BATCH_SIZE]
+        ).prefetch_renditions(*all_specs)
+        batch = []
+        for image in images:
+            filters = [Filter(spec) for spec in sorted(image_specs[image.pk])]
+            existing = image.find_existing_renditions(*filters)
+            missing = [f for f in filters if f not in existing]
+            if missing:
+                batch.append((image, missing))
+        yield batch
+
+
+def create_renditions(image, filters):
+    """Create renditions in a pool thread; returns how many were made"""
+    try:
+        return len(image.create_renditions(*filters))
+    finally:
+        # Each thread has its own connections, which would otherwise stay open
+        connections.close_all()
+
+
+def warm_renditions(image_specs, workers=WORKERS):
+    """
+    Generate the missing renditions of {image id: specs}.
+
+    Returns a dict of counts (images, generated, failed) and seconds taken.
+    Images that can't be read are logged and counted as failed.
+    """
+    start = time.perf_counter()
+    counts = {'images': len(image_specs), 'generated': 0, 'failed': 0}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in find_missing(image_specs):
+            futures = {
+                executor.submit(create_renditions, image, filters): (image, filters)
+                for image, filters in batch
+            }
+            for future in concurrent.futures.as_completed(futures):
+                image, filters = futures[future]
+                try:
+                    counts['generated'] += future.result()
+                except Exception:
+                    logger.exception('Could not create renditions of image %s', image.pk)
+                    counts['failed'] += len(filters)
+    counts['seconds'] = time.perf_counter() - start
+    return counts
+
+
+def warm_in_background(image_specs):
+    """Warm renditions in a thread once the current transaction commits"""
+    if not image_specs:
+        return
+
+    def run():
+        try:
+            warm_renditions(image_specs, workers=2)
+        finally:
+            connections.close_all()
+
+    transaction.on_commit(lambda: threading.Thread(target=run, daemon=True).start())
+
+
+def image_saved(sender, instance, **kwargs):
+    """Receiver for the image model's post_save"""
+    warm_in_background(get_image_specs([instance.pk]))
+
+
+def page_published(sender, instance, **kwargs):
+    """Receiver for page_published; pages without images are ignored"""
+    warm_in_background(get_page_image_specs(instance))
@@ -0,0 +1,103 @@
+"""
+Server-side product search backed by the Wagtail search backend.
+
+Full-text matching and ranking are done by the configured search backend
+(SQLite FTS locally, Postgres full-text search in production). SKUs are
+usually typed as a prefix ("BR-2"), which full-text search does not match,
+so SKU prefix matches are looked up separately and ranked first.
+"""
+from collections import Counter
+
+from django.db.models import Count
+from wagtail.models import Page
+
+from .catalog import get_live_products, serialize_products, with_thumbnails
+from .models import ProductsListingPage
+
+RESULTS_PER_PAGE = 20
+MAX_QUERY_LENGTH = 100
+
+
+def get_category_facets(category_counts):
+    """Return category facet dicts for a Counter of matching product category ids"""
+    categories = Page.objects.filter(pk__in=category_counts).values('id', 'title')
+    facets = [
+        {
+            'id': category['id'],
+            'title': category['title'],
+            'count': category_counts[category['id']],
+        }
+        for category in categories
+    ]
+    facets.sort(key=lambda facet: (-facet['count'], facet['title']))
+    return facets
+
+
+def search_products(query, category_id=None, page=1, request=None):
+    """
+    Search live products and return one page of results as a dict.
+
+    The result contains the total count, the page number and page count,
+    the serialised products for the requested page and category facets
+    counted over all matches (ignoring the category filter, so the facets
+    can be used to switch between categories).
+    """
+    # A double quote starts a phrase in SQLite's full-text syntax, and an
+    # unbalanced one is a syntax error
+    query = (query or '').replace('"', ' ').strip()[:MAX_QUERY_LENGTH]
+    search_result = {
+        'query': query,
+        'count': 0,
+        'page': 1,
+        'num_pages': 1,
+        'results': [],
+        'facets': {'category': []},
+    }
+
+    products_listing = ProductsListingPage.objects.live().first()
+    if not query or not products_listing:
+        return search_result
+
+    products = with_thumbnails(get_live_products(products_listing))
+
+    # SKU prefix matches, best ranked, then full-text matches on title,
+    # description and SKU, ranked by the backend
+    sku_matches = products.filter(sku__istartswith=query)
+    text_results = products.exclude(pk__in=sku_matches.values('pk')).search(query)
+
+    sku_counts = Counter(dict(sku_matches.order_by().values_list('category').annotate(Count('pk'))))
+    category_counts = sku_counts + Counter(text_results.facet('category_id'))
+    search_result['facets']['category'] = get_category_facets(category_counts)
+
+    # Facets already count every match, which saves another full-text query
+    total = sum(category_counts.values())
+    sku_total = sum(sku_counts.values())
+
+    if category_id is not None:
+        if category_id not in category_counts:
+            return search_result
+        products = products.filter(category=category_id)
+        sku_matches = sku_matches.filter(category=category_id)
+        text_results = products.exclude(pk__in=sku_matches.values('pk')).search(query)
+        total = category_counts[category_id]
+        sku_total = sku_counts[category_id]
+
+    num_pages = max(1, -(-total // RESULTS_PER_PAGE))
+    page = min(max(page, 1), num_pages)
+    start, stop = (page - 1) * RESULTS_PER_PAGE, page * RESULTS_PER_PAGE
+
+    page_products = []
+    if start < sku_total:
+        page_products += list(sku_matches.order_by('sku', 'pk')[start:stop])
+    if stop > sku_total:
+        text_start = max(start - sku_total, 0)
+        text_stop = stop - sku_total
+        page_products += list(text_results[text_start:text_stop])
+
+    search_result.update({
+        'count': total,
+        'page': page,
+        'num_pages': num_pages,
+        'results': serialize_products(page_products, request),
+    })
+    return search_result
@@ -0,0 +1,78 @@
+"""
+Versioned product search index for the products listing page.
+
+The compact catalog (see catalog.load_catalog) is serialised once, stored in
+the 'search' cache together with a content hash, and served from a URL that
+contains that hash. Publishing, unpublishing, moving or deleting a product or
+category drops the cached copy (see signals.py) and the next request
+rebuilds it under a new hash.
+
+Static builds can't run the search endpoint, so they get the current
+version of the index written out at the same URL (see write_search_index())
+and the listing page searches it in the browser.
+"""
+import hashlib
+import json
+import os
+
+from django.core.cache import caches
+from django.urls import reverse
+
+from .catalog import load_catalog
+from .models import ProductsListingPage
+
+SEARCH_INDEX_CACHE_KEY = 'products:search-index'
+
+
+def get_search_cache():
+    # Shared by every process, so invalidating it in one clears it for all
+    return caches['search']
+
+
+def build_search_index(request=None):
+    """Serialise the catalog and return a (version, content) tuple"""
+    products_listing = ProductsListingPage.objects.live().first()
+    products_data = load_catalog(products_listing, request) if products_listing else []
+    content = json.dumps(products_data, separators=(',', ':')).encode('utf-8')
+    version = hashlib.sha256(content).hexdigest()[:16]
+    return version, content
+
+
+def get_search_index(request=None):
+    """Return the cached (version, content) tuple, building it if necessary"""
+    search_index = get_search_cache().get(SEARCH_INDEX_CACHE_KEY)
+    if search_index is None:
+        search_index = build_search_index(request)
+        get_search_cache().set(SEARCH_INDEX_CACHE_KEY, search_index, None)
+    return search_index
+
+
+def invalidate_search_index():
+    """Drop the cached index so the next request rebuilds it"""
+    get_search_cache().delete(SEARCH_INDEX_CACHE_KEY)
+
+
+def get_search_index_url(request=None):
+    """URL of the current version of the index"""
+    version, content = get_search_index(request)
+    return reverse('products_search_index', kwargs={'version': version})
+
+
+def write_search_index(build_dir):
+    """
+    Write the current index into a static build at its URL, and delete the
+    versions it replaces. Returns the URL.
+    """
+    version, content = get_search_index()
+    url = reverse('products_search_index', kwargs={'version': version})
+    path = os.path.join(build_dir, url.lstrip('/'))
+    index_dir, file_name = os.path.split(path)
+    os.makedirs(index_dir, exist_ok=True)
+    for name in os.listdir(index_dir):
+        # Older versions, and their compressed copies
+        if not name.startswith(file_name):
+            os.remove(os.path.join(index_dir, name))
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(content)
+    return url
@@ -0,0 +1,62 @@
+"""
+Signal handlers keeping derived product data, cached pages and image
+renditions in sync with the page tree.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal
+from wagtail.images import get_image_model
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from oden_site.page_cache import page_changed, pages_changed
+
+from . import renditions
+from .models import ProductIndexPage, ProductPage
+from .search_index import invalidate_search_index
+
+# Sent once after a bulk import (see importer.py), which writes pages
+# without sending page_published for each of them
+products_imported = Signal()
+
+
+def update_product_fields(sender, instance, update_fields=None, **kwargs):
+    """Fill in the denormalised catalog fields when a product is saved"""
+    # Partial saves (save_revision() and the like) don't write them
+    if update_fields is None:
+        instance.update_catalog_fields()
+
+
+def update_product_category(sender, instance, parent_page_after, **kwargs):
+    """Point a moved product at its new category"""
+    # The move saves the page as a plain Page, so pre_save above doesn't see it
+    ProductPage.objects.filter(pk=instance.pk).update(category=parent_page_after.pk)
+
+
+pre_save.connect(update_product_fields, sender=ProductPage)
+post_page_move.connect(update_product_category, sender=ProductPage)
+
+
+def catalog_changed(sender, **kwargs):
+    """Invalidate catalog-wide caches when a product or category changes"""
+    invalidate_search_index()
+
+
+# Wagtail sends these signals with the specific page class as sender
+for model in (ProductIndexPage, ProductPage):
+    page_published.connect(catalog_changed, sender=model)
+    page_unpublished.connect(catalog_changed, sender=model)
+    post_page_move.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
+
+products_imported.connect(catalog_changed)
+
+
+# Rendered page cache: every page type, so edits to the homepage also count
+page_published.connect(page_changed)
+page_unpublished.connect(page_changed)
+post_delete.connect(page_changed)
+post_page_move.connect(pages_changed)
+products_imported.connect(pages_changed)
+
+# Image renditions the templates will ask for are generated in the background
+post_save.connect(renditions.image_saved, sender=get_image_model())
+page_published.connect(renditions.page_published)
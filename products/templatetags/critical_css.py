@@ -0,0 +1,36 @@
+"""
+Template tag that loads the site stylesheet without blocking rendering.
+
+    {% load critical_css %}
+    {% stylesheet page %}
+
+For page types with extracted critical CSS (see oden_site/critical_css.py)
+this inlines it and preloads main.css, switching it to a stylesheet once it
+has loaded. Otherwise, or with CRITICAL_CSS turned off, it is a plain
+<link rel="stylesheet">.
+"""
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from oden_site.critical_css import STYLESHEET, get_page_critical_css
+
+register = template.Library()
+
+
+@register.simple_tag
+def stylesheet(page=None):
+    href = static(STYLESHEET)
+    critical_css = get_page_critical_css(page)
+    if not critical_css:
+        return format_html('<link rel="stylesheet" href="{}">', href)
+    return format_html(
+        '<style>{}</style>\n'
+        '    <link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '    <noscript><link rel="stylesheet" href="{}"></noscript>',
+        # Our own CSS, which escaping would break (quotes in selectors)
+        mark_safe(critical_css.replace('</', '<\\/')),
+        href,
+        href,
+    )
@@ -0,0 +1,94 @@
+"""
+Template tags for responsive images in modern formats.
+
+    {% load responsive_images %}
+    {% responsive_image page.image 'detail' %}
+    {% responsive_image product.image 'card' class="product-image" position=forloop.counter0 %}
+    {% background_image_set page.hero_background '.hero-with-image' %}
+
+The image sets (sizes, formats and 'sizes' attributes) are defined in
+products/renditions.py, which also pre-generates their renditions.
+"""
+from django import template
+from django.utils.safestring import mark_safe
+from wagtail.images.models import Picture
+from wagtail.images.shortcuts import get_renditions_or_not_found
+
+from products.renditions import IMAGE_FORMATS, IMAGE_SETS, get_set_specs
+
+register = template.Library()
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def get_renditions(image, name):
+    """Renditions of every spec of an image set, keyed by spec"""
+    return get_renditions_or_not_found(image, get_set_specs(name))
+
+
+@register.simple_tag
+def responsive_image(image, name, position=None, **attrs):
+    """
+    <picture> with AVIF and WebP sources and a JPEG <img> fallback, each with
+    a srcset of the image set's sizes.
+
+    position is the image's index in a grid or list: images past the set's
+    'eager' count (the first row of cards) are lazy loaded. A single image
+    counts as the first.
+    """
+    if not image:
+        return ''
+    image_set = IMAGE_SETS[name]
+    attrs.setdefault('sizes', image_set['sizes'])
+    attrs.setdefault('decoding', 'async')
+    if (position or 0) >= image_set['eager']:
+        attrs.setdefault('loading', 'lazy')
+
+    # Images narrower than the largest sizes aren't upscaled, so drop the
+    # renditions that repeat a width already in the srcset
+    renditions = {}
+    widths = set()
+    for spec, rendition in get_renditions(image, name).items():
+        image_format = spec.rsplit('format-', 1)[1]
+        if (image_format, rendition.width) not in widths:
+            widths.add((image_format, rendition.width))
+            renditions[spec] = rendition
+    return mark_safe(Picture(renditions, attrs).__html__())
+
+
+def css_image_set(renditions):
+    """image-set() of the same image in each format, best format first"""
+    return 'image-set({})'.format(', '.join(
+        f'url("{rendition.url}") type("{MIME_TYPES[image_format]}")'
+        for image_format, rendition in renditions
+    ))
+
+
+@register.simple_tag
+def background_image_set(image, selector, name='hero'):
+    """
+    <style> rules setting image as the background of selector.
+
+    Each size of the image set is an image-set() of its formats, used on
+    viewports up to that width, so phones get the smallest image. Browsers
+    without image-set() use the JPEG url() before it.
+    """
+    if not image:
+        return ''
+    renditions = get_renditions(image, name)
+    rules = []
+    # Largest first, so the @media rule of each smaller size overrides it
+    for index, spec in enumerate(reversed(IMAGE_SETS[name]['specs'])):
+        formats = [
+            (image_format, renditions[f'{spec}|format-{image_format}'])
+            for image_format in IMAGE_FORMATS
+        ]
+        rule = (
+            f'{selector} {{ background-image: url("{formats[-1][1].url}"); '
+            f'background-image: {css_image_set(formats)}; }}'
+        )
+        if index:
+            max_width = spec.split('-')[1]
+            rule = f'@media (max-width: {max_width}px) {{ {rule} }}'
+        rules.append(rule)
+    return mark_safe('<style>\n{}\n</style>'.format('\n'.join(rules)))
@@ -0,0 +1,317 @@
+import json
+import os
+import tempfile
+from base64 import urlsafe_b64encode
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from wagtail.models import Page, Site
+
+from benchmarks.catalog import seed_catalog
+from home.models import HomePage
+from oden_site.page_cache import get_page_cache
+from oden_site.static_build import build_pages
+
+from .bulk import ChildPathAllocator, bulk_create_pages
+from .catalog import load_catalog
+from .importer import ProductImporter, claim_next_import, delete_old_uploads, run_import, start_import
+from .models import ProductImport, ProductIndexPage, ProductPage, ProductsListingPage
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .search import search_products
+from .search_index import get_search_index, get_search_index_url
+
+
+# Tests run with DEBUG off, without a collectstatic manifest
+static_without_manifest = override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+
+
+def encode_json(data):
+    return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+@static_without_manifest
+@override_settings(PAGE_CACHE_PAGE_TYPES=[], PERF_LOG_SAMPLE_RATE=0)
+class CatalogQueryCountTests(TestCase):
+    """Page and catalog query counts don't grow with the number of products"""
+
+    def setUp(self):
+        Page.objects.filter(depth=2).delete()
+        home = Page.get_first_root_node().add_child(instance=HomePage(title='Home', slug='home'))
+        Site.objects.update_or_create(
+            is_default_site=True,
+            defaults={'hostname': 'localhost', 'port': 80, 'root_page': home},
+        )
+        self.products_listing = home.add_child(instance=ProductsListingPage(title='Products', slug='products'))
+        self.categories = 0
+
+    def add_category(self, products):
+        number = self.categories = self.categories + 1
+        category = self.products_listing.add_child(
+            instance=ProductIndexPage(title=f'Category {number}', slug=f'category-{number}'),
+        )
+        for product in range(products):
+            category.add_child(instance=ProductPage(
+                title=f'Product {number}-{product}', slug=f'product-{number}-{product}',
+                sku=f'OD-{number:02d}{product:04d}', price=10 + product,
+            ))
+
+    def get_urls(self):
+        return {
+            'home': '/',
+            'listing': self.products_listing.url,
+            'category': ProductIndexPage.objects.order_by('path').first().url,
+            'product': ProductPage.objects.order_by('path').first().url,
+        }
+
+    def count_queries(self):
+        """Query count of each page, after a request that warms the caches"""
+        client = Client()
+        counts = {}
+        for name, url in self.get_urls().items():
+            self.assertEqual(client.get(url).status_code, 200)
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            counts[name] = len(queries)
+        with CaptureQueriesContext(connection) as queries:
+            load_catalog(self.products_listing)
+        counts['catalog'] = len(queries)
+        return counts
+
+    def test_query_counts_are_constant(self):
+        for _ in range(2):
+            self.add_category(products=6)
+        small = self.count_queries()
+
+        for _ in range(4):
+            self.add_category(products=12)
+        for name, url in self.get_urls().items():
+            with self.subTest(name), self.assertNumQueries(small[name]):
+                Client().get(url)
+        with self.assertNumQueries(small['catalog']):
+            self.assertEqual(len(load_catalog(self.products_listing)), 60)
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.products_listing = seed_catalog(products=0, categories=1)
+
+    def import_rows(self, rows, **kwargs):
+        return ProductImporter(self.products_listing, **kwargs).run(rows)
+
+    def test_import_creates_then_skips_unchanged_rows(self):
+        rows = [
+            {'product_category': 'Category 0', 'product': 'Rack', 'price': '10.00'},
+            {'product_category': 'Shelters', 'product': 'Shelter', 'price': '250'},
+        ]
+        result = self.import_rows(rows)
+        self.assertEqual((result.created_categories, result.created_products), (1, 2))
+        self.assertEqual(ProductPage.objects.live().get(title='Shelter').price, Decimal('250.00'))
+
+        result = self.import_rows(rows)
+        self.assertEqual((result.created_products, result.unchanged_products), (0, 2))
+
+        rows[0]['price'] = '12.50'
+        result = self.import_rows(rows)
+        self.assertEqual((result.updated_products, result.unchanged_products), (1, 1))
+        self.assertEqual(ProductPage.objects.get(title='Rack').price, Decimal('12.50'))
+
+    def test_invalid_prices_are_row_errors(self):
+        rows = [
+            {'product_category': 'Category 0', 'product': name, 'price': price}
+            for name, price in [('A', 'abc'), ('B', 'NaN'), ('C', 'inf'), ('D', '1e20'), ('E', '9.99')]
+        ]
+        result = self.import_rows(rows)
+        self.assertEqual(len(result.errors), 4)
+        self.assertEqual(list(ProductPage.objects.values_list('title', flat=True)), ['E'])
+
+    def test_resume_only_from_latest_failed_import(self):
+        failed = ProductImport.objects.create(file_name='products.csv', status=ProductImport.FAILED, rows_committed=5)
+        ProductImport.objects.create(file_name='products.csv', status=ProductImport.COMPLETE, rows_committed=9)
+        self.assertEqual(start_import('products.csv', resume=True).rows_committed, 0)
+
+        ProductImport.objects.all().delete()
+        failed = ProductImport.objects.create(file_name='products.csv', status=ProductImport.FAILED, rows_committed=5)
+        self.assertEqual(start_import('products.csv', resume=True).rows_committed, 5)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, ProductImport.SUPERSEDED)
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        stopped_at = timezone.now() - ProductImport.STALE_AFTER * 2
+        stale = ProductImport.objects.create(file_name='stale.csv', status=ProductImport.RUNNING, csv_data=b'')
+        command_line = ProductImport.objects.create(file_name='cli.csv', status=ProductImport.RUNNING)
+        ProductImport.objects.update(updated_at=stopped_at)
+        queued = ProductImport.objects.create(file_name='queued.csv', status=ProductImport.QUEUED, csv_data=b'')
+
+        self.assertEqual(claim_next_import().pk, stale.pk)
+        self.assertEqual(claim_next_import().pk, queued.pk)
+        self.assertIsNone(claim_next_import())
+        command_line.refresh_from_db()
+        self.assertEqual(command_line.status, ProductImport.FAILED)
+
+    def test_queued_upload_is_imported_then_deleted(self):
+        record = ProductImport.objects.create(
+            file_name='products.csv', status=ProductImport.QUEUED,
+            csv_data=b'product_category,product,price\nCategory 0,Rack,10\n',
+        )
+        run_import(claim_next_import())
+        record.refresh_from_db()
+        self.assertEqual(record.status, ProductImport.COMPLETE)
+        self.assertIsNone(record.csv_data)
+        self.assertTrue(ProductPage.objects.filter(title='Rack').exists())
+
+    def test_old_failed_uploads_are_deleted(self):
+        old = ProductImport.objects.create(file_name='old.csv', status=ProductImport.FAILED, csv_data=b'x')
+        ProductImport.objects.update(updated_at=timezone.now() - ProductImport.UPLOAD_RETENTION * 2)
+        recent = ProductImport.objects.create(file_name='recent.csv', status=ProductImport.FAILED, csv_data=b'x')
+
+        self.assertEqual(delete_old_uploads(), 1)
+        self.assertFalse(ProductImport.objects.get(pk=old.pk).has_upload)
+        self.assertTrue(ProductImport.objects.defer('csv_data').get(pk=recent.pk).can_retry)
+
+
+class BulkTests(TestCase):
+    def test_bulk_created_pages_form_a_valid_tree(self):
+        products_listing = seed_catalog(products=0, categories=2)
+        categories = list(ProductIndexPage.objects.order_by('path'))
+        allocator = ChildPathAllocator(categories)
+        pages = []
+        for number in range(10):
+            category = categories[number % 2]
+            page = ProductPage(title=f'Product {number}', slug=f'product-{number}', price=1)
+            allocator.position(page, category)
+            pages.append(page)
+        bulk_create_pages(pages)
+        allocator.update_numchild()
+
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+        self.assertEqual([category.get_children().count() for category in categories], [5, 5])
+        self.assertEqual(products_listing.get_descendants().type(ProductPage).count(), 10)
+
+
+@static_without_manifest
+class KeysetPaginationTests(TestCase):
+    ordering = ('price', 'id')
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=25, categories=1)
+
+    def test_pages_cover_every_product_once(self):
+        queryset = ProductPage.objects.all()
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(queryset, self.ordering, cursor, 10)
+            seen += [product.pk for product in page.object_list]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(queryset.order_by(*self.ordering).values_list('pk', flat=True)))
+
+    def test_cursor_round_trip(self):
+        product = ProductPage.objects.first()
+        cursor = encode_cursor([product.price, product.pk])
+        self.assertEqual(decode_cursor(ProductPage, self.ordering, cursor), [product.price, product.pk])
+
+    def test_invalid_cursors_give_the_first_page(self):
+        for cursor in ['!!!', encode_json('{}'), encode_json('[1]'), encode_json('[null, 1]'),
+                       encode_json('[true, 1]'), encode_json('[[1], 1]'), encode_json('["x", 1]')]:
+            with self.subTest(cursor):
+                self.assertIsNone(decode_cursor(ProductPage, self.ordering, cursor))
+
+        url = ProductIndexPage.objects.get().url
+        response = self.client.get(url, {'sort': 'title', 'after': encode_json('[null, 1]')})
+        self.assertEqual(response.status_code, 200)
+
+
+@static_without_manifest
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=45, categories=3)
+
+    def test_sku_matches_are_counted_and_paged(self):
+        result = search_products('OD-0000')
+        self.assertEqual(result['count'], 45)
+        self.assertEqual(result['num_pages'], 3)
+        last_page = search_products('OD-0000', page=3)
+        self.assertEqual([product['sku'] for product in last_page['results']][-1], 'OD-000044')
+
+    def test_unbalanced_quote(self):
+        self.assertEqual(search_products('"')['count'], 0)
+        self.assertEqual(self.client.get('/products/search/', {'q': '"'}).status_code, 200)
+
+
+@static_without_manifest
+@override_settings(PERF_LOG_SAMPLE_RATE=0)
+class PageCacheMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=30, categories=1)
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.url = ProductIndexPage.objects.get().url
+
+    def test_anonymous_views_are_cached(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+        self.assertNotIn('X-Page-Cache', self.client.get(self.url, {'sort': 'price'}))
+
+    def test_logged_in_views_are_not_cached(self):
+        user = get_user_model().objects.create_user('editor', password='password')
+        self.client.force_login(user)
+        self.assertNotIn('X-Page-Cache', self.client.get(self.url))
+
+    def test_publishing_invalidates(self):
+        self.client.get(self.url)
+        product = ProductPage.objects.order_by('-pk').first()
+        product.title = 'Renamed Product'
+        product.save_revision().publish()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Renamed Product')
+
+    def test_static_build_is_not_cached(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            build_pages(build_dir, rebuild_all=True)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertEqual(len(response.context['products']), ProductIndexPage.PRODUCTS_PER_PAGE)
+
+
+@static_without_manifest
+class StaticBuildTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products=5, categories=1)
+
+    def test_search_index_is_baked(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            build_pages(build_dir, rebuild_all=True)
+            version, content = get_search_index()
+            with open(os.path.join(build_dir, 'products', 'search-index', f'{version}.json')) as f:
+                self.assertEqual(len(json.load(f)), 5)
+
+    def test_template_changes_rebuild_every_page(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            build_pages(build_dir)
+            self.assertEqual(build_pages(build_dir)['rendered'], 0)
+            with mock.patch('oden_site.static_build.get_templates_hash', return_value='changed'):
+                report = build_pages(build_dir)
+            self.assertEqual(report['rendered'], report['total'])
+
+    def test_listing_page_searches_the_baked_index(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            build_pages(build_dir, rebuild_all=True)
+            with open(os.path.join(build_dir, 'products', 'index.html')) as f:
+                html = f.read()
+        self.assertIn(f'data-index-url="{get_search_index_url()}"', html)
+        self.assertNotIn('data-search-url', html)
+        self.assertContains(self.client.get('/products/'), 'data-search-url="/products/search/"')
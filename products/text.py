@@ -0,0 +1,22 @@
+"""
+Plain text versions of rich text, stored on ProductPage when it is saved
+so listings, search and page metadata never parse HTML per request.
+
+Kept free of model imports so migrations can use them.
+"""
+from wagtail.rich_text import get_text_for_indexing
+
+SUMMARY_LENGTH = 160
+
+
+def plain_text(html):
+    """Rich text HTML as plain text, with entities decoded and whitespace collapsed"""
+    return ' '.join(get_text_for_indexing(html or '').split())
+
+
+def summarise(text, length=SUMMARY_LENGTH):
+    """Plain text cut at a word boundary to at most length characters"""
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0] if ' ' in text[:length] else text[:length - 1]
+    return cut.rstrip(' ,.;:-') + '…'
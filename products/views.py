@@ -1,3 +1,69 @@
 # Views for products app
 # CSV import view is in admin.py to be accessible from Wagtail admin
 
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_safe
+
+from .search import search_products
+from .search_index import get_search_index, write_search_index
+
+# The index URL changes whenever its content does, so it can be cached forever
+SEARCH_INDEX_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@require_safe
+def search_index(request, version):
+    """Serve the compact product search index for the given content version"""
+    current_version, content = get_search_index(request)
+    if version != current_version:
+        # Stale or guessed version - send the client to the current one
+        response = redirect('products_search_index', version=current_version)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    etag = f'"{current_version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = SEARCH_INDEX_CACHE_CONTROL
+    return response
+
+
+
+class SearchIndexBuildView:
+    """
+    Writes the search index into static builds, next to the pages (see
+    BAKERY_VIEWS), for the listing page to search in the browser.
+    """
+
+    @property
+    def build_method(self):
+        return self.build
+
+    def build(self):
+        write_search_index(settings.BUILD_DIR)
+
+
+def _int_param(request, name, default=None):
+    """Return a GET parameter as an int, or default if it is missing or invalid"""
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return default
+
+
+@require_safe
+@cache_control(public=True, max_age=60)
+def product_search(request):
+    """JSON product search: ?q=<query>&category=<category id>&page=<page number>"""
+    return JsonResponse(search_products(
+        request.GET.get('q', ''),
+        category_id=_int_param(request, 'category'),
+        page=_int_param(request, 'page', 1),
+        request=request,
+    ))
@@ -1,16 +1,20 @@
 #!/bin/bash
 set -e
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput || true
+export BOOT_STARTED=$(date +%s.%N)
 
-echo "Running database migrations..."
-python manage.py migrate --noinput
+# Static files are collected at build time (railway.json), so this only
+# applies pending migrations and creates the cache table and superuser if
+# needed, in one Django process, and prints how long each step took
+python manage.py boot
 
-# Create superuser if one doesn't exist
-echo "Checking for superuser..."
-python create_superuser.py
+# Admin CSV imports are queued in the database and run by this worker,
+# restarted if it exits. Queued uploads are kept in the database, and a
+# job left running by a restart is picked up again once it goes stale.
+echo "Starting import worker..."
+(while true; do python manage.py import_worker || true; sleep 5; done) &
 
+# Workers, threads, timeouts and logging are set in gunicorn.conf.py
 echo "Starting gunicorn server..."
-exec gunicorn oden_site.wsgi:application --bind 0.0.0.0:$PORT --log-level info --access-logfile - --error-logfile -
+exec gunicorn
 
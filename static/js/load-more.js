@@ -0,0 +1,16 @@
+// "Load more" fetches the next cards and the next button in their place;
+// without JavaScript the button is a link to the next page
+document.querySelector('.product-grid').addEventListener('click', async (e) => {
+    const link = e.target.closest('.load-more a');
+    if (!link) {
+        return;
+    }
+    e.preventDefault();
+    link.setAttribute('aria-busy', 'true');
+    const response = await fetch(link.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+    if (!response.ok) {
+        window.location = link.href;
+        return;
+    }
+    link.closest('.load-more').outerHTML = await response.text();
+});
@@ -0,0 +1,216 @@
+// Products listing search. Search runs on the server, one page of results
+// at a time; the search URL comes from the input's data-search-url. Static
+// builds can't run the search endpoint and give a data-index-url instead:
+// the whole catalog as JSON, downloaded on the first search and searched
+// in the browser.
+const searchInput = document.getElementById('product-search-input');
+const searchUrl = searchInput.dataset.searchUrl;
+const indexUrl = searchInput.dataset.indexUrl;
+const searchResults = document.getElementById('search-results');
+
+// As in products/search.py
+const RESULTS_PER_PAGE = 20;
+const MAX_QUERY_LENGTH = 100;
+
+let currentQuery = '';
+let currentCategory = null;
+let searchController = null;
+let searchIndex = null;
+
+function loadSearchIndex() {
+    if (!searchIndex) {
+        searchIndex = fetch(indexUrl)
+            .then(response => response.json())
+            .then(products => products.map(product => ({
+                product,
+                sku: product.sku.toLowerCase(),
+                text: [product.title, product.sku, product.category, product.summary].join(' ').toLowerCase(),
+            })))
+            .catch(error => {
+                // Try again on the next search
+                searchIndex = null;
+                throw error;
+            });
+    }
+    return searchIndex;
+}
+
+// The search endpoint's response for the baked index: SKU prefix matches
+// first, then products containing every word of the query
+function searchIndexedProducts(index, query, category, page) {
+    if (!query) {
+        return { query, count: 0, page: 1, num_pages: 1, results: [], facets: { category: [] } };
+    }
+    const needle = query.toLowerCase();
+    const words = needle.split(/\s+/);
+    const skuMatches = [];
+    const textMatches = [];
+    index.forEach(entry => {
+        if (entry.sku && entry.sku.startsWith(needle)) {
+            skuMatches.push(entry);
+        } else if (words.every(word => entry.text.includes(word))) {
+            textMatches.push(entry);
+        }
+    });
+    skuMatches.sort((a, b) => a.sku.localeCompare(b.sku));
+    const matches = skuMatches.concat(textMatches).map(entry => entry.product);
+
+    const facets = new Map();
+    matches.forEach(product => {
+        const facet = facets.get(product.category_id) || { id: product.category_id, title: product.category, count: 0 };
+        facet.count += 1;
+        facets.set(product.category_id, facet);
+    });
+
+    const results = category === null ? matches : matches.filter(product => product.category_id === category);
+    const numPages = Math.max(1, Math.ceil(results.length / RESULTS_PER_PAGE));
+    page = Math.min(Math.max(page, 1), numPages);
+    return {
+        query,
+        count: results.length,
+        page,
+        num_pages: numPages,
+        results: results.slice((page - 1) * RESULTS_PER_PAGE, page * RESULTS_PER_PAGE),
+        facets: {
+            category: [...facets.values()].sort((a, b) => b.count - a.count || a.title.localeCompare(b.title)),
+        },
+    };
+}
+
+async function searchProducts(query, category = null, page = 1) {
+    if (!query || query.trim().length === 0) {
+        searchResults.innerHTML = '';
+        searchResults.style.display = 'none';
+        return;
+    }
+
+    currentQuery = query.trim();
+    currentCategory = category;
+
+    // Abort any in-flight request so stale results never overwrite newer ones
+    if (searchController) {
+        searchController.abort();
+    }
+    searchController = new AbortController();
+
+    const params = new URLSearchParams({ q: currentQuery, page: page });
+    if (category !== null) {
+        params.set('category', category);
+    }
+
+    let data;
+    try {
+        if (searchUrl) {
+            const response = await fetch(`${searchUrl}?${params}`, { signal: searchController.signal });
+            data = await response.json();
+        } else {
+            const controller = searchController;
+            const index = await loadSearchIndex();
+            if (controller.signal.aborted) {
+                return;
+            }
+            const query = currentQuery.replace(/"/g, ' ').trim().slice(0, MAX_QUERY_LENGTH);
+            data = searchIndexedProducts(index, query, category, page);
+        }
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            return;
+        }
+        throw error;
+    }
+
+    displayResults(data, page > 1);
+}
+
+function displayResults(data, append) {
+    if (data.count === 0) {
+        searchResults.innerHTML = `
+            <div class="search-no-results">
+                <p>No products found matching "${escapeHtml(data.query)}"</p>
+            </div>
+        `;
+        searchResults.style.display = 'block';
+        return;
+    }
+
+    let cards = '';
+    data.results.forEach(product => {
+        const imageHtml = product.thumbnail 
+            ? `<img src="${product.thumbnail}" alt="${escapeHtml(product.title)}" class="search-result-image" loading="lazy" />`
+            : `<div class="search-result-image-placeholder">No Image</div>`;
+
+        cards += `
+            <div class="search-result-card">
+                <a href="${product.url}" class="search-result-link">
+                    ${imageHtml}
+                    <div class="search-result-info">
+                        <h4 class="search-result-title">${escapeHtml(product.title)}</h4>
+                        <p class="search-result-category">${escapeHtml(product.category)}</p>
+                        ${product.summary ? `<p class="search-result-summary">${escapeHtml(product.summary)}</p>` : ''}
+                        <p class="search-result-price">$${product.price}</p>
+                        ${product.sku ? `<p class="search-result-sku">SKU: ${escapeHtml(product.sku)}</p>` : ''}
+                    </div>
+                </a>
+            </div>
+        `;
+    });
+
+    const loadMore = data.page < data.num_pages
+        ? `<div class="search-load-more"><button type="button" class="btn btn-secondary btn-small" data-page="${data.page + 1}">Load more</button></div>`
+        : '';
+
+    if (append) {
+        searchResults.querySelector('.search-load-more')?.remove();
+        searchResults.querySelector('.search-results-grid').insertAdjacentHTML('beforeend', cards);
+        searchResults.insertAdjacentHTML('beforeend', loadMore);
+    } else {
+        let facets = '';
+        if (data.facets.category.length > 1 || currentCategory !== null) {
+            facets = '<div class="search-facets">';
+            facets += `<button type="button" class="search-facet${currentCategory === null ? ' active' : ''}" data-category="">All (${data.facets.category.reduce((total, facet) => total + facet.count, 0)})</button>`;
+            data.facets.category.forEach(facet => {
+                facets += `<button type="button" class="search-facet${currentCategory === facet.id ? ' active' : ''}" data-category="${facet.id}">${escapeHtml(facet.title)} (${facet.count})</button>`;
+            });
+            facets += '</div>';
+        }
+        searchResults.innerHTML = `${facets}<div class="search-results-grid">${cards}</div>${loadMore}`;
+    }
+    searchResults.style.display = 'block';
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Category facets and "Load more" paging
+searchResults.addEventListener('click', (e) => {
+    const facet = e.target.closest('.search-facet');
+    if (facet) {
+        searchProducts(currentQuery, facet.dataset.category ? Number(facet.dataset.category) : null);
+        return;
+    }
+    const loadMore = e.target.closest('.search-load-more button');
+    if (loadMore) {
+        searchProducts(currentQuery, currentCategory, Number(loadMore.dataset.page));
+    }
+});
+
+// Debounce search to avoid a request per keystroke
+let searchTimeout;
+searchInput.addEventListener('input', (e) => {
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(() => {
+        searchProducts(e.target.value);
+    }, 250);
+});
+
+// Hide results when clicking outside
+document.addEventListener('click', (e) => {
+    if (!searchInput.contains(e.target) && !searchResults.contains(e.target)) {
+        if (searchInput.value.trim().length === 0) {
+            searchResults.style.display = 'none';
+        }
+    }
+});